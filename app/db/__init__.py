@@ -1,5 +1,48 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
 from app.db.models import Base
 from app.db.session import engine
 
-def init_db():
-    Base.metadata.create_all(engine)
+
+def add_missing_columns(conn):
+    """create_all не меняет существующие таблицы, поэтому новые колонки добавляем сами"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+
+def enable_autoincrement(conn):
+    """Пересоздаёт таблицы SQLite, которым нужен AUTOINCREMENT, если они созданы без него"""
+    if conn.dialect.name != "sqlite":
+        return
+    for table in Base.metadata.sorted_tables:
+        if not table.dialect_options["sqlite"]["autoincrement"]:
+            continue
+        ddl = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).scalar()
+        if not ddl or "AUTOINCREMENT" in ddl.upper():
+            continue
+        # Индексы переезжают вместе с переименованной таблицей, поэтому удаляем их до создания новой
+        old = f"{table.name}_old"
+        conn.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {old}")
+        for index in table.indexes:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+        table.create(conn)
+        columns = ", ".join(column.name for column in table.columns)
+        conn.exec_driver_sql(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old}")
+        conn.exec_driver_sql(f"DROP TABLE {old}")
+
+
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(enable_autoincrement)
\ No newline at end of file
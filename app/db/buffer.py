@@ -0,0 +1,76 @@
+import asyncio
+import logging
+
+from sqlalchemy import insert
+
+from app.db.session import Session
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Копит строки для вставки и пишет их одним executemany.
+
+    Сброс — когда набралось flush_size строк, раз в flush_interval секунд и при остановке.
+    Если запись не удалась, строки возвращаются в буфер и уйдут со следующим сбросом."""
+
+    def __init__(self, model, flush_size: int, flush_interval: float):
+        self.model = model
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.rows = []
+        self.flushed = 0
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._flush_task = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, row: dict):
+        self.add_many([row])
+
+    def add_many(self, rows):
+        self.rows.extend(rows)
+        # Сброс уже идёт — новые строки уйдут следующим
+        if len(self.rows) >= self.flush_size and not self._lock.locked():
+            self._flush_task = asyncio.create_task(self._safe_flush())
+
+    async def flush(self):
+        async with self._lock:
+            if not self.rows:
+                return
+            batch, self.rows = self.rows, []
+            try:
+                async with Session() as session:
+                    await session.execute(insert(self.model), batch)
+                    await session.commit()
+                self.flushed += len(batch)
+            except Exception:
+                self.rows[:0] = batch
+                raise
+
+    async def _safe_flush(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush {self.model.__tablename__}: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._safe_flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Останавливает периодический сброс и записывает остаток"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._flush_task:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
\ No newline at end of file
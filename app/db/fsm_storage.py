@@ -0,0 +1,159 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import FSM_STORAGE, REDIS_URL, FSM_STATE_TTL, FSM_CACHE_SIZE, FSM_CACHE_TTL
+from app.db.models import FsmState
+from app.db.session import Session
+
+logger = logging.getLogger(__name__)
+
+# Вставка с обновлением при конфликте ключа; для остальных СУБД — session.merge
+UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class DbStorage(BaseStorage):
+    """FSM-хранилище в таблице fsm_states с кэшем последних чатов.
+
+    Кэш сквозной: запись сразу уходит в БД, чтение активного чата обходится без запроса.
+    Состояния, которые не менялись дольше ttl секунд, считаются брошенными: при чтении
+    они пустые, а из таблицы их удаляет фоновая чистка."""
+
+    def __init__(self, session_pool: async_sessionmaker, ttl: int, cache_size: int, cache_ttl: float):
+        self.session_pool = session_pool
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache = OrderedDict()  # ключ -> (state, data, до какого момента запись в кэше свежая)
+        self.hits = 0
+        self.misses = 0
+        self._task = None
+
+    @staticmethod
+    def build_key(key: StorageKey) -> str:
+        parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+        if key.thread_id:
+            parts.append(str(key.thread_id))
+        if key.business_connection_id:
+            parts.append(key.business_connection_id)
+        parts.append(key.destiny)
+        return ":".join(parts)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data = await self._load(key)
+        await self._save(key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        state, _ = await self._load(key)
+        await self._save(key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(key)
+        return dict(data)
+
+    async def _load(self, key: StorageKey):
+        name = self.build_key(key)
+        cached = self.cache.get(name)
+        if cached and cached[2] > time.monotonic():
+            self.cache.move_to_end(name)
+            self.hits += 1
+            return cached[0], cached[1]
+
+        self.misses += 1
+        async with self.session_pool() as session:
+            row = await session.get(FsmState, name)
+        if row is None or self._expired(row.updated_at):
+            state, data = None, {}
+        else:
+            state, data = row.state, json.loads(row.data) if row.data else {}
+        self._remember(name, state, data)
+        return state, data
+
+    async def _save(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        name = self.build_key(key)
+        async with self.session_pool() as session:
+            if state is None and not data:
+                # Пустое состояние не храним, чтобы таблица не росла
+                await session.execute(delete(FsmState).where(FsmState.key == name))
+            else:
+                values = {"key": name, "state": state, "data": json.dumps(data, ensure_ascii=False),
+                          "updated_at": datetime.utcnow()}
+                upsert = UPSERTS.get(session.bind.dialect.name)
+                if upsert is None:
+                    await session.merge(FsmState(**values))
+                else:
+                    await session.execute(
+                        upsert(FsmState).values(**values)
+                        .on_conflict_do_update(index_elements=[FsmState.key], set_=values)
+                    )
+            await session.commit()
+        self._remember(name, state, data)
+
+    def _remember(self, name: str, state: Optional[str], data: Dict[str, Any]):
+        if not self.cache_size or not self.cache_ttl:
+            return
+        self.cache[name] = (state, data, time.monotonic() + self.cache_ttl)
+        self.cache.move_to_end(name)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _expired(self, updated_at: datetime) -> bool:
+        return bool(self.ttl) and updated_at < datetime.utcnow() - timedelta(seconds=self.ttl)
+
+    async def purge_expired(self) -> int:
+        """Удаляет брошенные состояния, возвращает их число"""
+        if not self.ttl:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        async with self.session_pool() as session:
+            result = await session.execute(delete(FsmState).where(FsmState.updated_at < cutoff))
+            await session.commit()
+        return result.rowcount
+
+    async def _purge_loop(self):
+        while True:
+            try:
+                purged = await self.purge_expired()
+                if purged:
+                    logger.info(f"Purged {purged} abandoned FSM states")
+            except Exception as e:
+                logger.error(f"Failed to purge FSM states: {e}")
+            await asyncio.sleep(min(self.ttl, 3600))
+
+    def start(self):
+        """Запускает фоновую чистку брошенных состояний (из работающего event loop)"""
+        if self.ttl and self._task is None:
+            self._task = asyncio.create_task(self._purge_loop())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Хранилище FSM по настройке FSM_STORAGE"""
+    if FSM_STORAGE == "memory":
+        return MemoryStorage()
+    if FSM_STORAGE == "redis":
+        # Пакет redis нужен только в этом режиме
+        from aiogram.fsm.storage.redis import RedisStorage
+        ttl = FSM_STATE_TTL or None
+        return RedisStorage.from_url(REDIS_URL, state_ttl=ttl, data_ttl=ttl)
+    return DbStorage(Session, FSM_STATE_TTL, FSM_CACHE_SIZE, FSM_CACHE_TTL)
@@ -0,0 +1,74 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.config import DB_LEAK_THRESHOLD
+
+
+class PoolMetrics:
+    """Счётчики пула соединений и сессий для команды /metrics"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.gc_leaked = 0
+        self.sessions_opened = 0
+        self.sessions_closed = 0
+        self.rollbacks = 0
+        self._checked_out = {}  # id(connection_record) -> время выдачи из пула
+
+    def record_wait(self, seconds: float):
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def attach(self, engine):
+        """Подписывается на события пула движка"""
+        target = engine.sync_engine
+
+        @event.listens_for(target, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self.checkouts += 1
+            self._checked_out[id(connection_record)] = time.monotonic()
+
+        @event.listens_for(target, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            self.checkins += 1
+            self._checked_out.pop(id(connection_record), None)
+
+        @event.listens_for(target, "reset")
+        def on_reset(dbapi_connection, connection_record, reset_state):
+            # Соединение возвращает сборщик мусора: сессию забыли закрыть. checkin в этом случае
+            # не приходит, поэтому соединение перестаём считать выданным здесь
+            if not reset_state.asyncio_safe:
+                self.gc_leaked += 1
+                self._checked_out.pop(id(connection_record), None)
+
+    @property
+    def checked_out(self) -> int:
+        return len(self._checked_out)
+
+    @property
+    def long_held(self) -> int:
+        """Соединения, которые держат дольше DB_LEAK_THRESHOLD секунд"""
+        now = time.monotonic()
+        return sum(1 for started in self._checked_out.values() if now - started > DB_LEAK_THRESHOLD)
+
+    @property
+    def avg_wait(self) -> float:
+        return self.wait_total / self.checkouts if self.checkouts else 0.0
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """Пул, который замеряет время ожидания свободного соединения"""
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        pool_metrics.record_wait(time.perf_counter() - started)
+        return connection
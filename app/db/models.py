@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, ForeignKey, UniqueConstraint
 from datetime import datetime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -15,9 +15,14 @@ class User(Base):
     grade = Column(Integer, nullable=True)
     subjects = Column(String, nullable=True)
     region = Column(String, nullable=True)
+    # Часовой пояс (IANA), выводится из региона; NULL — DEFAULT_TIMEZONE
+    timezone = Column(String, nullable=True)
     username = Column(String, nullable=True)
     consent = Column(Boolean, default=False)
     role = Column(Integer, default=0, nullable=False)
+    # Бот заблокирован или чат удалён: не пишем, пока пользователь снова не нажмёт /start
+    is_blocked = Column(Boolean, default=False, nullable=False, server_default="0")
+    blocked_at = Column(DateTime, nullable=True)
     feedbacks = relationship("Feedback", back_populates="user")
 
 
@@ -66,17 +71,57 @@ class UserReminder(Base):
     end_time = Column(String, nullable=True)  # Конец периода отправки (может быть NULL)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    next_fire_at = Column(DateTime, nullable=True)  # Следующий запуск interval/random (UTC)
 
     user = relationship("User")
 
 
+class ReminderChange(Base):
+    """Журнал изменений напоминаний: по нему диспетчер (в боте или отдельном воркере) обновляет индекс"""
+    __tablename__ = "reminder_changes"
+    # Без AUTOINCREMENT SQLite после очистки журнала снова выдаёт id с 1, и диспетчер их пропустит
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    reminder_id = Column(Integer, nullable=True)  # NULL — перечитать все напоминания
+    kind = Column(String, nullable=True)  # NULL — напоминания; 'quotes' — перечитать пул цитат
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class FsmState(Base):
+    """FSM-состояния пользователей (анкета, мастер напоминаний, рассылка): переживают перезапуск"""
+    __tablename__ = "fsm_states"
+
+    key = Column(String, primary_key=True)  # bot_id:chat_id:user_id[:thread_id][:business_connection_id]:destiny
+    state = Column(String, nullable=True)
+    data = Column(Text, nullable=True)  # JSON
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)  # UTC, по нему истекает TTL
+
+
+class ShardLease(Base):
+    """Аренда шарда напоминаний воркером: user_id % REMINDER_SHARDS == shard"""
+    __tablename__ = "shard_leases"
+
+    shard = Column(Integer, primary_key=True)
+    owner = Column(String, nullable=True)  # id воркера, NULL — шард свободен
+    expires_at = Column(DateTime, nullable=False)  # UTC
+
+
+class ReminderWorker(Base):
+    """Живые воркеры напоминаний: по ним считается справедливая доля шардов"""
+    __tablename__ = "reminder_workers"
+
+    owner = Column(String, primary_key=True)
+    seen_at = Column(DateTime, nullable=False)  # UTC, обновляется каждым тиком
+
+
 class ReminderStat(Base):
     __tablename__ = "reminder_stats"
 
     id = Column(Integer, primary_key=True)
     reminder_id = Column(Integer, ForeignKey("user_reminders.id"))
     sent_at = Column(DateTime, default=datetime.utcnow)
-    status = Column(String)  # 'sent', 'skipped_quiet_time', 'error'
+    status = Column(String)  # 'sent', 'skipped_quiet_time', 'error', 'blocked'
 
     reminder = relationship("UserReminder")
 
@@ -89,3 +134,31 @@ class Quote(Base):
     category = Column(String)  # Для категоризации цитат
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BroadcastJob(Base):
+    __tablename__ = "broadcast_jobs"
+
+    id = Column(Integer, primary_key=True)
+    created_by = Column(Integer, nullable=False)  # админ, запустивший рассылку
+    from_chat_id = Column(Integer, nullable=False)  # откуда копируем сообщение
+    message_id = Column(Integer, nullable=False)
+    status = Column(String, default='running')  # 'running' или 'done'
+    # Итоговые счётчики, обновляются при каждом сохранении результатов
+    sent_count = Column(Integer, default=0, nullable=False, server_default="0")
+    failed_count = Column(Integer, default=0, nullable=False, server_default="0")
+    blocked_count = Column(Integer, default=0, nullable=False, server_default="0")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class BroadcastDelivery(Base):
+    __tablename__ = "broadcast_deliveries"
+    __table_args__ = (UniqueConstraint("job_id", "user_id"),)
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("broadcast_jobs.id"), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    status = Column(String)  # 'sent', 'failed' или 'blocked'
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,5 +1,8 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
-engine = create_engine("sqlite:///data.db")
-Session = sessionmaker(bind=engine)
+from app.config import DATABASE_URL
+from app.db.metrics import MeteredPool, pool_metrics
+
+engine = create_async_engine(DATABASE_URL, poolclass=MeteredPool)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+pool_metrics.attach(engine)
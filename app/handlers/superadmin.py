@@ -1,9 +1,12 @@
 from aiogram import Router
 from aiogram.types import Message
 from aiogram.filters import Command
-from app.db.session import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import User
-from app.config import OWNER_ID, ADMIN_IDS
+from app.config import OWNER_ID
+from app.utils.admins import admin_registry
+from app.utils.roles import role_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,7 +14,7 @@ router = Router()
 
 
 @router.message(Command("add_admin"))
-async def add_admin(message: Message):
+async def add_admin(message: Message, session: AsyncSession):
     if message.from_user.id != OWNER_ID:
         return await message.answer("⛔ Только владелец может добавлять админов")
 
@@ -20,27 +23,25 @@ async def add_admin(message: Message):
     except (IndexError, ValueError):
         return await message.answer("Использование: /add_admin [user_id]")
 
-    session = Session()
-    user = session.query(User).filter_by(user_id=admin_id).first()
+    user = await session.scalar(select(User).filter_by(user_id=admin_id))
     if user:
         user.role = 1
-        session.commit()
-        # Добавляем в конфиг
-        if admin_id not in ADMIN_IDS:
-            ADMIN_IDS.append(admin_id)
+        await session.commit()
+        await admin_registry.refresh(session)
+        role_cache.invalidate(admin_id)
         await message.answer(f"✅ Пользователь {admin_id} стал админом")
     else:
         # Если пользователя нет в базе, создаем его
         new_user = User(user_id=admin_id, role=1)
         session.add(new_user)
-        session.commit()
-        if admin_id not in ADMIN_IDS:
-            ADMIN_IDS.append(admin_id)
+        await session.commit()
+        await admin_registry.refresh(session)
+        role_cache.invalidate(admin_id)
         await message.answer(f"✅ Пользователь {admin_id} добавлен в базу и стал админом")
 
 
 @router.message(Command("remove_admin"))
-async def remove_admin(message: Message):
+async def remove_admin(message: Message, session: AsyncSession):
     if message.from_user.id != OWNER_ID:
         return await message.answer("⛔ Только владелец может удалять админов")
 
@@ -49,27 +50,24 @@ async def remove_admin(message: Message):
     except (IndexError, ValueError):
         return await message.answer("Использование: /remove_admin [user_id]")
 
-    session = Session()
-    user = session.query(User).filter_by(user_id=admin_id).first()
+    user = await session.scalar(select(User).filter_by(user_id=admin_id))
     if user and user.role == 1:
         user.role = 0
-        session.commit()
-        # Удаляем из конфига
-        if admin_id in ADMIN_IDS:
-            ADMIN_IDS.remove(admin_id)
+        await session.commit()
+        await admin_registry.refresh(session)
+        role_cache.invalidate(admin_id)
         await message.answer(f"✅ Пользователь {admin_id} больше не админ")
     else:
         await message.answer("❌ Пользователь не найден или не является админом")
 
 
 @router.message(Command("list_admins"))
-async def list_admins(message: Message):
+async def list_admins(message: Message, session: AsyncSession):
     if message.from_user.id != OWNER_ID:
         return await message.answer("⛔ Только владелец может просматривать список админов")
 
-    session = Session()
     # Получаем всех пользователей с ролью >= 1 (админы и владелец)
-    admins = session.query(User).filter(User.role >= 1).all()
+    admins = (await session.scalars(select(User).filter(User.role >= 1))).all()
 
     if not admins:
         await message.answer("❌ В системе нет администраторов")
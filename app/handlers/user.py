@@ -2,11 +2,13 @@ from aiogram import Router, F
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, CallbackQuery
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import Session
 from app.db.models import User
 from app.keyboards import get_main_menu
 from app.utils.roles import get_user_role
+from app.utils.timezones import update_user_timezone
 
 router = Router()
 
@@ -19,22 +21,21 @@ class ProfileStates(StatesGroup):
     role = 0
 
 @router.callback_query(F.data == "fill_profile")
-async def handle_fill_profile(callback: CallbackQuery, state: FSMContext):
+async def handle_fill_profile(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
-    await start_profile(callback.message, state)
+    await start_profile(callback.message, state, session)
 
 @router.message(F.text == "📝 Заполнить/обновить")
-async def cmd_profile(message: Message, state: FSMContext):
-    await start_profile(message, state)
+async def cmd_profile(message: Message, state: FSMContext, session: AsyncSession):
+    await start_profile(message, state, session)
 
-async def start_profile(message: Message, state: FSMContext):
-    session = Session()
+async def start_profile(message: Message, state: FSMContext, session: AsyncSession):
     user_id = message.from_user.id
-    user = session.query(User).filter_by(user_id=user_id).first()
+    user = await session.scalar(select(User).filter_by(user_id=user_id))
     if not user:
         user = User(user_id=user_id)
         session.add(user)
-        session.commit()
+        await session.commit()
 
     await message.answer("В каком ты классе в 25/26 учебном году? (введи число или '-', чтобы пропустить.)")
     await state.set_state(ProfileStates.grade)
@@ -103,13 +104,12 @@ async def set_username(message: Message, state: FSMContext):
     await state.set_state(ProfileStates.consent)
 
 @router.message(ProfileStates.consent)
-async def set_consent(message: Message, state: FSMContext):
+async def set_consent(message: Message, state: FSMContext, session: AsyncSession):
     if message.text.strip() not in ["✅ Да", "❌ Нет"]:
         return await message.answer("Пожалуйста, выбери ✅ Да или ❌ Нет с клавиатуры.")
 
     consent = "✅" in message.text
-    session = Session()
-    user = session.query(User).filter_by(user_id=message.from_user.id).first()
+    user = await session.scalar(select(User).filter_by(user_id=message.from_user.id))
 
     if not user:
         await message.answer("Что-то пошло не так. Попробуй ещё раз с /start или 📝 «Заполнить/обновить».")
@@ -122,11 +122,12 @@ async def set_consent(message: Message, state: FSMContext):
         user.region = None
         user.username = None
         user.consent = False
-        session.commit()
+        await update_user_timezone(session, user)
+        await session.commit()
 
         await message.answer(
             "Анкета удалена ❌, так как ты не дал(а) согласие на обработку данных.",
-            reply_markup=get_main_menu(get_user_role(message.from_user.id))
+            reply_markup=get_main_menu(await get_user_role(session, message.from_user.id))
         )
         await state.clear()
         return
@@ -137,9 +138,11 @@ async def set_consent(message: Message, state: FSMContext):
     user.region = data["region"]
     user.username = data.get("username")
     user.consent = True
-    session.commit()
+    # Напоминания приходят по местному времени: пояс берём из региона
+    await update_user_timezone(session, user)
+    await session.commit()
 
-    role = get_user_role(message.from_user.id)
+    role = await get_user_role(session, message.from_user.id)
     await message.answer("Спасибо! Профиль обновлён ✅", reply_markup=get_main_menu(role))
     await state.clear()
 
@@ -157,9 +160,8 @@ async def profile_menu(message: Message):
 
 
 @router.message(F.text == "📄 Посмотреть анкету")
-async def show_profile(message: Message):
-    session = Session()
-    user = session.query(User).filter_by(user_id=message.from_user.id).first()
+async def show_profile(message: Message, session: AsyncSession):
+    user = await session.scalar(select(User).filter_by(user_id=message.from_user.id))
     if not user:
         return await message.answer("Ты пока не заполнял анкету.")
 
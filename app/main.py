@@ -1,40 +1,57 @@
 import asyncio
-from aiogram import Bot, Dispatcher, F
+from datetime import datetime
+from aiogram import Dispatcher, F
 from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
+import pytz
 
 from app.handlers import user, admin, broadcast, superadmin
+from app.services.broadcast_service import resume_broadcasts, stop_broadcasts
 from app.services import (library, library_admin, feedback, feedback_admin, chat, chat_admin, question,
                           question_admin, reminders_admin, reminders)
-from app.db.session import Session
+from app.db.session import Session, engine
+from app.db.metrics import pool_metrics
 from app.db.models import User
+from app.middlewares.db import DbSessionMiddleware
+from app.middlewares.ordering import ChatOrderingMiddleware, HandlerTimingMiddleware, update_metrics
 from app.keyboards import get_main_menu
 from app.db import init_db
-from app.config import BOT_TOKEN
-from app.utils.roles import get_user_role
+from app.db.fsm_storage import DbStorage, create_fsm_storage
+from app.config import DB_LEAK_THRESHOLD, ADMIN_IDS, SCHEDULER_MODE, UPDATE_CONCURRENCY
+from app.utils.roles import get_user_role, role_cache
+from app.utils.admins import admin_registry
+from app.utils.telegram import create_bot
+from app.utils.timezones import refresh_timezones
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
+bot = create_bot()
+# FSM-мидлварь подключаем сами в setup(): она должна стоять после упорядочивания апдейтов
+dp = Dispatcher(storage=create_fsm_storage(), disable_fsm=True)
 
 
 @dp.message(CommandStart())
-async def start_cmd(message: Message, state: FSMContext):
-    session = Session()
+async def start_cmd(message: Message, state: FSMContext, session: AsyncSession):
     user_id = message.from_user.id
     is_new = False
-    role = get_user_role(user_id)
+    role = await get_user_role(session, user_id)
 
-    if user_id != bot.id and not session.query(User).filter_by(user_id=user_id).first():
+    db_user = await session.scalar(select(User).filter_by(user_id=user_id))
+    if user_id != bot.id and not db_user:
         session.add(User(user_id=user_id, role=0))
-        session.commit()
+        await session.commit()
         is_new = True
+    elif db_user and db_user.is_blocked:
+        # Пользователь вернулся: снова можно писать ему
+        db_user.is_blocked = False
+        db_user.blocked_at = None
+        await session.commit()
 
     await message.answer(
         "Привет! Я бот проекта «Заботать!» — психологическая поддержка для олимпиадников 💛\n\nВыбирай нужный раздел в меню ниже.",
@@ -77,8 +94,8 @@ async def handle_about(message: Message):
 
 
 @dp.message(lambda m: m.text == "⬅️ Назад")
-async def handle_back(message: Message):
-    role = get_user_role(message.from_user.id)
+async def handle_back(message: Message, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     await message.answer("Главное меню:", reply_markup=get_main_menu(role))
 
 
@@ -87,19 +104,107 @@ async def get_my_id(message: Message):
     await message.answer(f"Твой user_id: {message.from_user.id}\nТвой username: @{message.from_user.username or 'нет'}")
 
 
-@dp.message(F.text == "/check_scheduler")
+@dp.message(F.text.startswith("/check_scheduler"))
 async def check_scheduler(message: Message):
-    """Проверка состояния планировщика"""
-    from app.services.reminder_service import scheduler
-    jobs = scheduler.get_jobs()
-    await message.answer(f"Планировщик работает. Заданий в очереди: {len(jobs)}")
+    """Проверка состояния планировщика, с ID — где лежит конкретное напоминание"""
+    if SCHEDULER_MODE == "worker":
+        return await message.answer("Напоминания обрабатывает отдельный процесс (run_worker.py).")
 
+    from app.services.reminder_service import dispatcher, leases, tick_stats
+    args = message.text.split()
+    if len(args) > 1 and args[1].isdigit():
+        reminder_id = int(args[1])
+        if reminder_id not in dispatcher:
+            return await message.answer(f"Напоминания {reminder_id} нет в диспетчере.")
+        minutes, next_fire, zone = dispatcher.describe(reminder_id)
+        if minutes is not None:
+            times = ", ".join(f"{minute // 60:02d}:{minute % 60:02d}" for minute in minutes) or "все в тихом времени"
+            return await message.answer(f"Напоминание {reminder_id}: по времени {times} ({zone})")
+        next_run = datetime.fromtimestamp(next_fire, pytz.timezone(zone)).strftime("%d.%m.%Y %H:%M")
+        return await message.answer(f"Напоминание {reminder_id}: следующий запуск {next_run} ({zone})")
 
-async def main():
-    init_db()
+    await message.answer(
+        f"Планировщик работает. Напоминаний в диспетчере: {len(dispatcher)} "
+        f"(по времени: {len(dispatcher.slots)}, интервальных и случайных: {len(dispatcher.next_fire)}).\n"
+        f"Запусков в сутки, пропущенных из-за тихого времени: {dispatcher.skipped_per_day()}\n"
+        f"Часовых поясов: {len(dispatcher.offsets)}\n"
+        f"Запусков с опозданием: {tick_stats['late']}, пропущено совсем: {tick_stats['missed']}\n"
+        f"Шарды этого процесса: {sorted(leases.owned)} из {leases.shards}"
+    )
+
+
+@dp.message(F.text == "/metrics")
+async def show_metrics(message: Message, session: AsyncSession):
+    """Метрики пула соединений и сессий БД, очереди апдейтов и хендлеров"""
+    if await get_user_role(session, message.from_user.id) < 1:
+        return await message.answer("⛔ У тебя нет прав для этой команды.")
+
+    pool = engine.sync_engine.pool
+    slowest = "\n".join(
+        f"{name}: {calls} выз., среднее {avg * 1000:.0f} мс, максимум {longest * 1000:.0f} мс"
+        for name, calls, avg, longest in update_metrics.slowest()
+    )
+    fsm_cache = ""
+    if isinstance(dp.storage, DbStorage):
+        fsm_cache = (f"\n\n🧭 <b>FSM</b>\nКэш: {len(dp.storage.cache)} чатов, "
+                     f"попаданий: {dp.storage.hits}, промахов: {dp.storage.misses}")
+    await message.answer(
+        f"📊 <b>База данных</b>\n"
+        f"Пул: {pool.status()}\n"
+        f"Выдач соединений: {pool_metrics.checkouts}, возвратов: {pool_metrics.checkins}\n"
+        f"Сейчас выдано: {pool_metrics.checked_out}\n"
+        f"Ожидание соединения: среднее {pool_metrics.avg_wait * 1000:.1f} мс, "
+        f"максимум {pool_metrics.wait_max * 1000:.1f} мс\n"
+        f"Сессий открыто/закрыто: {pool_metrics.sessions_opened}/{pool_metrics.sessions_closed}, "
+        f"откатов: {pool_metrics.rollbacks}\n"
+        f"Утечки: удерживаются дольше {DB_LEAK_THRESHOLD} с — {pool_metrics.long_held}, "
+        f"собраны GC — {pool_metrics.gc_leaked}\n\n"
+        f"👤 <b>Кэш ролей</b>\n"
+        f"Записей: {len(role_cache)}, попаданий: {role_cache.hits}, промахов: {role_cache.misses}\n\n"
+        f"📨 <b>Апдейты</b>\n"
+        f"Обрабатываются: {update_metrics.active} из {UPDATE_CONCURRENCY}, в очереди: {update_metrics.waiting} "
+        f"(максимум {update_metrics.waiting_max}), всего обработано: {update_metrics.processed}\n"
+        f"Самые медленные хендлеры:\n{slowest or 'пока нет данных'}"
+        f"{fsm_cache}",
+        parse_mode="HTML"
+    )
+
+
+async def setup():
+    """Всё, что нужно до приёма апдейтов: БД, админы, планировщик, роутеры, прерванные рассылки"""
+    await init_db()
     logger.info("Бот запускается...")
 
-    # Планировщик уже инициализирован при импорте модуля
+    # Незаконченные диалоги хранятся в БД; брошенные удаляем по таймеру
+    if isinstance(dp.storage, DbStorage):
+        dp.storage.start()
+
+    # Переносим начальный список админов в БД и загружаем снимок реестра
+    async with Session() as session:
+        await admin_registry.seed(session, ADMIN_IDS)
+
+    # Таблица регионов могла измениться с прошлого запуска: поправляем сохранённые пояса
+    async with Session() as session:
+        changed = await refresh_timezones(session)
+        await session.commit()
+    if changed:
+        logger.info(f"Updated time zones of {changed} users")
+
+    # Планировщик запускаем внутри event loop бота, если он не вынесен в отдельный воркер
+    from app.services.reminder_service import init_scheduler, reminder_stats
+    if SCHEDULER_MODE == "embedded":
+        await init_scheduler()
+    else:
+        # /test_reminder отправляет и из бота: его статистику тоже сбрасываем по таймеру
+        reminder_stats.start()
+
+    # Разные чаты обрабатываем параллельно, один чат — по порядку; только потом читаем FSM-состояние
+    dp.update.outer_middleware(ChatOrderingMiddleware(UPDATE_CONCURRENCY))
+    dp.update.outer_middleware(dp.fsm)
+    # Одна сессия БД на каждый апдейт
+    dp.update.outer_middleware(DbSessionMiddleware(Session))
+    dp.message.middleware(HandlerTimingMiddleware())
+    dp.callback_query.middleware(HandlerTimingMiddleware())
 
     # Подключаем роутеры
     dp.include_router(user.router)
@@ -117,8 +222,40 @@ async def main():
     dp.include_router(reminders.router)
     dp.include_router(reminders_admin.router)
 
+    # Продолжаем рассылки, прерванные перезапуском
+    await resume_broadcasts(bot)
+
+
+async def cleanup():
+    """Останавливает фоновую работу до закрытия сессии бота и пула: в обратном порядке всё падает с ошибками"""
+    from app.services.reminder_service import shutdown_scheduler, reminder_stats
+    # Рассылки останавливаем, пока работают сессия бота и БД; недосланное продолжится после перезапуска
+    await stop_broadcasts()
+    # Дописываем накопленную статистику напоминаний до закрытия пула
+    if SCHEDULER_MODE == "embedded":
+        await shutdown_scheduler()
+    else:
+        try:
+            await reminder_stats.close()
+        except Exception as e:
+            logger.error(f"Failed to flush reminder stats: {e}")
+    await bot.session.close()
+    # Закрываем соединения пула, иначе потоки aiosqlite не дадут процессу завершиться
+    await engine.dispose()
+
+
+async def main():
+    """Long polling; вебхук — app/webhook.py (run_webhook.py)"""
+    await setup()
+
     # Запускаем бота
-    await dp.start_polling(bot)
+    try:
+        # Если до этого бот работал через вебхук, getUpdates без его снятия не работает
+        await bot.delete_webhook()
+        # Сессию бота закрывает cleanup(), после остановки рассылок
+        await dp.start_polling(bot, close_bot_session=False)
+    finally:
+        await cleanup()
 
 
 if __name__ == "__main__":
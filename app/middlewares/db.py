@@ -0,0 +1,39 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.metrics import pool_metrics
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Открывает одну сессию БД на апдейт и передаёт её в хендлеры как `session`.
+
+    Если хендлер завершился без ошибки, несохранённые изменения коммитятся,
+    иначе откатываются. Сессия закрывается в любом случае.
+    """
+
+    def __init__(self, session_pool: async_sessionmaker):
+        self.session_pool = session_pool
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        pool_metrics.sessions_opened += 1
+        try:
+            async with self.session_pool() as session:
+                data["session"] = session
+                try:
+                    result = await handler(event, data)
+                except Exception:
+                    pool_metrics.rollbacks += 1
+                    await session.rollback()
+                    raise
+                await session.commit()
+                return result
+        finally:
+            pool_metrics.sessions_closed += 1
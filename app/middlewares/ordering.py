@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class UpdateMetrics:
+    """Глубина очереди апдейтов и время работы хендлеров для /metrics"""
+
+    def __init__(self):
+        self.waiting = 0
+        self.waiting_max = 0
+        self.active = 0
+        self.processed = 0
+        self.handlers = defaultdict(lambda: [0, 0.0, 0.0])  # имя хендлера -> [вызовов, всего секунд, максимум]
+
+    def record(self, name: str, seconds: float):
+        stats = self.handlers[name]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+
+    def slowest(self, count: int = 5):
+        """[(имя, вызовов, среднее, максимум)] по убыванию среднего времени"""
+        rows = [(name, calls, total / calls, longest) for name, (calls, total, longest) in self.handlers.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)[:count]
+
+
+update_metrics = UpdateMetrics()
+
+
+class ChatOrderingMiddleware(BaseMiddleware):
+    """Апдейты разных чатов обрабатываются параллельно, не больше limit одновременно,
+    а апдейты одного чата — строго по очереди.
+
+    Должен стоять раньше FSM-мидлвари: состояние читается только после того, как
+    предыдущий апдейт этого чата его сохранил."""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.locks = {}  # chat_id -> [Lock, сколько апдейтов его ждут или держат]
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        chat = data.get("event_chat") or data.get("event_from_user")
+        if chat is None:
+            async with self.semaphore:
+                return await self._run(handler, event, data)
+
+        entry = self.locks.setdefault(chat.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        update_metrics.waiting += 1
+        update_metrics.waiting_max = max(update_metrics.waiting_max, update_metrics.waiting)
+        waiting = True
+        try:
+            # Lock отдаёт захват в порядке ожидания, поэтому очередность внутри чата сохраняется
+            async with entry[0]:
+                async with self.semaphore:
+                    update_metrics.waiting -= 1
+                    waiting = False
+                    return await self._run(handler, event, data)
+        finally:
+            if waiting:
+                update_metrics.waiting -= 1
+            entry[1] -= 1
+            if not entry[1]:
+                del self.locks[chat.id]
+
+    @staticmethod
+    async def _run(handler, event, data):
+        update_metrics.active += 1
+        try:
+            return await handler(event, data)
+        finally:
+            update_metrics.active -= 1
+            update_metrics.processed += 1
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Замеряет время каждого хендлера (внутренняя мидлварь: хендлер уже выбран)"""
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        callback = data["handler"].callback
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            name = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+            update_metrics.record(name, time.perf_counter() - started)
@@ -0,0 +1,342 @@
+from collections import Counter
+from datetime import datetime
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (TelegramRetryAfter, TelegramBadRequest, TelegramAPIError, TelegramNetworkError,
+                                TelegramServerError)
+from aiogram.types import Message
+from sqlalchemy import select, insert, update, func
+
+from app.db.session import Session
+from app.db.models import User, BroadcastJob, BroadcastDelivery
+from app.config import (BROADCAST_RATE, BROADCAST_WORKERS, BROADCAST_MAX_RETRIES, BROADCAST_FLUSH_SIZE,
+                        BROADCAST_CHUNK_SIZE, BROADCAST_PROGRESS_INTERVAL)
+from app.keyboards import get_main_menu
+from app.utils.roles import get_user_role
+from app.utils.delivery import is_permanent_error, mark_unreachable
+
+logger = logging.getLogger(__name__)
+
+# Рассылки, которые выполняются в этом процессе: job_id -> asyncio.Task
+running_jobs = {}
+
+
+class TokenBucket:
+    """Ограничитель частоты: не больше rate отправок в секунду с запасом на capacity"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Останавливает все отправки, например после 429 от Telegram"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class ProgressReporter:
+    """Обновляет сообщение о прогрессе рассылки не чаще раза в interval секунд"""
+
+    def __init__(self, message: Optional[Message], bucket: TokenBucket, total: int, job: BroadcastJob,
+                 interval: float = BROADCAST_PROGRESS_INTERVAL):
+        self.message = message
+        self.bucket = bucket
+        self.total = total
+        self.interval = interval
+        # Начинаем с уже сохранённых счётчиков, если рассылка возобновлена
+        self.counts = Counter(sent=job.sent_count, failed=job.failed_count, blocked=job.blocked_count)
+        self.started = time.monotonic()
+        self.done_at_start = self.processed
+        self._shown = None
+        self._task = None
+
+    @property
+    def processed(self):
+        return sum(self.counts.values())
+
+    def add(self, status: str):
+        self.counts[status] += 1
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def rate(self) -> float:
+        """Скорость отправки в этом запуске, сообщений в секунду"""
+        elapsed = self.elapsed()
+        return (self.processed - self.done_at_start) / elapsed if elapsed else 0.0
+
+    def render(self) -> str:
+        left = max(self.total - self.processed, 0)
+        rate = self.rate()
+        eta = f"{left / rate / 60:.1f} мин" if rate else "—"
+        return (
+            f"📤 Рассылка в процессе...\n"
+            f"Успешно: {self.counts['sent']}\n"
+            f"Не удалось: {self.counts['failed']}\n"
+            f"Заблокировали бота: {self.counts['blocked']}\n"
+            f"Осталось: {left}\n"
+            f"Скорость: {rate:.1f} сообщ./с, осталось ~{eta}"
+        )
+
+    async def refresh(self):
+        # Без сообщения (админу не удалось написать) только считаем, скорость нужна для итога
+        if self.message is None or self.processed == self._shown:
+            return
+        self._shown = self.processed
+        # Правка сообщения тоже запрос к API, поэтому берём токен из общего лимита
+        await self.bucket.acquire()
+        try:
+            await self.message.edit_text(self.render())
+        except TelegramRetryAfter as e:
+            self.bucket.pause(e.retry_after)
+        except TelegramAPIError as e:
+            # Сеть или сервер Telegram: пропускаем это обновление, следующее попробуем по таймеру
+            logger.warning(f"Broadcast progress update failed: {e.message}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Broadcast progress update failed: {e}")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def stop_broadcasts():
+    """Останавливает рассылки этого процесса, сохранив уже отправленное; остальное дошлёт resume_broadcasts"""
+    tasks = list(running_jobs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def start_broadcast(bot: Bot, job_id: int):
+    """Запускает рассылку в фоне, если она ещё не выполняется"""
+    task = running_jobs.get(job_id)
+    if task and not task.done():
+        return task
+
+    task = asyncio.create_task(run_broadcast(bot, job_id))
+    running_jobs[job_id] = task
+    task.add_done_callback(lambda _: running_jobs.pop(job_id, None))
+    return task
+
+
+async def resume_broadcasts(bot: Bot):
+    """Продолжает рассылки, прерванные остановкой процесса"""
+    async with Session() as session:
+        job_ids = (await session.scalars(select(BroadcastJob.id).filter_by(status='running'))).all()
+
+    for job_id in job_ids:
+        logger.info(f"Resuming broadcast {job_id}")
+        await start_broadcast(bot, job_id)
+
+
+async def iter_recipients(job_id: int, chunk_size: int = BROADCAST_CHUNK_SIZE):
+    """Отдаёт user_id получателей пачками по ключу, пропуская тех, кому уже отправляли"""
+    last_user_id = None
+    while True:
+        # Короткая сессия на пачку, чтобы не держать соединение во время отправки
+        async with Session() as session:
+            query = select(User.user_id).where(User.is_blocked == False).order_by(User.user_id).limit(chunk_size)
+            if last_user_id is not None:
+                query = query.where(User.user_id > last_user_id)
+            chunk = (await session.scalars(query)).all()
+            if not chunk:
+                return
+
+            done = set((await session.scalars(
+                select(BroadcastDelivery.user_id).where(
+                    BroadcastDelivery.job_id == job_id,
+                    BroadcastDelivery.user_id.in_(chunk)
+                )
+            )).all())
+
+        last_user_id = chunk[-1]
+        for user_id in chunk:
+            if user_id not in done:
+                yield user_id
+
+
+async def deliver(bot: Bot, job: BroadcastJob, user_id: int, bucket: TokenBucket):
+    """Копирует сообщение рассылки одному пользователю, возвращает (статус, ошибка).
+
+    Статус None — сбой не окончательный (сеть, 5xx, флуд-контроль): строку доставки не пишем,
+    и пользователь получит сообщение при возобновлении рассылки"""
+    last_error = 'retry limit exceeded'
+    for attempt in range(BROADCAST_MAX_RETRIES):
+        await bucket.acquire()
+        try:
+            await bot.copy_message(
+                chat_id=user_id,
+                from_chat_id=job.from_chat_id,
+                message_id=job.message_id
+            )
+            return 'sent', None
+        except TelegramRetryAfter as e:
+            logger.warning(f"Broadcast {job.id}: flood control, pausing for {e.retry_after}s")
+            bucket.pause(e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            logger.warning(f"Broadcast {job.id}: temporary error for user {user_id}: {e}")
+            last_error = str(e)
+            await asyncio.sleep(attempt + 1)
+        except Exception as e:
+            if is_permanent_error(e):
+                return 'blocked', str(e)
+            logger.error(f"Ошибка при отправке пользователю {user_id}: {e}")
+            return 'failed', str(e)
+
+    return None, last_error
+
+
+async def run_broadcast(bot: Bot, job_id: int):
+    async with Session() as session:
+        job = await session.get(BroadcastJob, job_id)
+        if not job or job.status != 'running':
+            return
+
+        # Рассылаем ВСЕМ пользователям, не только тем, кто дал согласие, кроме заблокировавших бота.
+        # При возобновлении учитываем тех, кого бот уже пометил недоступными в этой рассылке
+        total = await session.scalar(select(func.count()).select_from(User).filter_by(is_blocked=False))
+        total += job.blocked_count
+
+    results = []
+    # Пользователи, которым не удалось отправить из-за временных сбоев
+    deferred = []
+    flush_lock = asyncio.Lock()
+    bucket = TokenBucket(BROADCAST_RATE)
+    queue = asyncio.Queue(maxsize=BROADCAST_WORKERS * 2)
+
+    try:
+        progress_msg = await bot.send_message(job.created_by, f"📤 Начинаем рассылку для {total} пользователей...")
+    except Exception as e:
+        # Админ мог заблокировать бота: рассылку всё равно доводим до конца, просто без прогресса
+        logger.warning(f"Broadcast {job_id}: cannot send progress message to {job.created_by}: {e}")
+        progress_msg = None
+    progress = ProgressReporter(progress_msg, bucket, total, job)
+    progress.start()
+
+    async def flush():
+        """Сохраняет накопленные результаты и счётчики одной пачкой"""
+        async with flush_lock:
+            if not results:
+                return
+            batch = results[:]
+            results.clear()
+            statuses = Counter(item["status"] for item in batch)
+            async with Session() as flush_session:
+                await flush_session.execute(insert(BroadcastDelivery), batch)
+                await flush_session.execute(
+                    update(BroadcastJob).filter_by(id=job_id).values(
+                        sent_count=BroadcastJob.sent_count + statuses['sent'],
+                        failed_count=BroadcastJob.failed_count + statuses['failed'],
+                        blocked_count=BroadcastJob.blocked_count + statuses['blocked']
+                    )
+                )
+                # Недоступных пользователей помечаем сразу, чтобы не писать им снова
+                await mark_unreachable(
+                    flush_session, [item["user_id"] for item in batch if item["status"] == 'blocked']
+                )
+                await flush_session.commit()
+
+    async def worker():
+        while True:
+            user_id = await queue.get()
+            if user_id is None:
+                return
+
+            status, error = await deliver(bot, job, user_id, bucket)
+            if status is None:
+                deferred.append(user_id)
+                continue
+            progress.add(status)
+            results.append({"job_id": job_id, "user_id": user_id, "status": status, "error": error})
+            if len(results) >= BROADCAST_FLUSH_SIZE:
+                await flush()
+
+    async def produce():
+        async for user_id in iter_recipients(job_id):
+            await queue.put(user_id)
+        for _ in range(BROADCAST_WORKERS):
+            await queue.put(None)
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(worker()) for _ in range(BROADCAST_WORKERS)]
+    try:
+        # Если упали обработчики, очередь больше никто не разберёт: ошибку сразу отдаём наверх
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    except Exception as e:
+        logger.error(f"Broadcast {job_id} stopped: {e}")
+        raise
+    finally:
+        # При остановке сохраняем уже отправленное, чтобы не разослать его повторно
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await progress.stop()
+        await asyncio.shield(flush())
+
+    async with Session() as session:
+        job = await session.get(BroadcastJob, job_id)
+        if not deferred:
+            job.status = 'done'
+            job.finished_at = datetime.utcnow()
+            await session.commit()
+        role = await get_user_role(session, job.created_by)
+
+    # Удаляем сообщение о прогрессе
+    if progress_msg:
+        try:
+            await progress_msg.delete()
+        except TelegramAPIError:
+            pass
+
+    if deferred:
+        # Рассылка остаётся 'running': resume_broadcasts дошлёт этим пользователям после перезапуска
+        logger.warning(f"Broadcast {job_id}: {len(deferred)} deliveries deferred after temporary errors")
+    title = (f"⚠️ Рассылка приостановлена: {len(deferred)} сообщ. не ушли из-за сбоев связи, "
+             f"отправим их после перезапуска бота" if deferred else "✅ Рассылка завершена")
+    try:
+        await bot.send_message(
+            job.created_by,
+            f"{title}\n"
+            f"Успешно: {job.sent_count}\n"
+            f"Не удалось: {job.failed_count}\n"
+            f"Заблокировали бота: {job.blocked_count}\n"
+            f"Время: {progress.elapsed():.0f} с, {progress.rate():.1f} сообщ./с",
+            reply_markup=get_main_menu(role)
+        )
+    except Exception as e:
+        logger.warning(f"Broadcast {job_id}: cannot send summary to {job.created_by}: {e}")
@@ -3,9 +3,10 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
 
-from app.db.session import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import Feedback, User
-from app.config import ADMIN_IDS as ADMINS
+from app.utils.admins import admin_registry
 from app.keyboards import get_support_menu
 from app.utils.format import format_user_info
 
@@ -57,7 +58,7 @@ async def process_problem(message: Message, state: FSMContext):
 
 
 @router.callback_query(ChatStates.waiting_permissions, F.data.startswith("permission_"))
-async def process_permissions(call: CallbackQuery, state: FSMContext):
+async def process_permissions(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     await call.answer()
     data = await state.get_data()
     problem_text = data.get("problem_text", "")
@@ -71,7 +72,6 @@ async def process_permissions(call: CallbackQuery, state: FSMContext):
     can_publish = (publish_perm == "yes")
     include_profile = (profile_perm == "yes")
 
-    session = Session()
     fb = Feedback(
         user_id=call.from_user.id,
         text=problem_text,
@@ -81,7 +81,7 @@ async def process_permissions(call: CallbackQuery, state: FSMContext):
         is_published=False
     )
     session.add(fb)
-    session.commit()
+    await session.commit()
 
     response_text = "💛 Спасибо за доверие! Твой вопрос сохранён."
     if not can_publish:
@@ -91,10 +91,10 @@ async def process_permissions(call: CallbackQuery, state: FSMContext):
 
     await call.message.answer(response_text, reply_markup=get_support_menu())
 
-    user = session.query(User).filter_by(user_id=call.from_user.id).first()
+    user = await session.scalar(select(User).filter_by(user_id=call.from_user.id))
     user_info = format_user_info(user, include_profile)
 
-    for admin_id in ADMINS:
+    for admin_id in await admin_registry.get(session):
         if can_publish:
             markup = InlineKeyboardMarkup(
                 inline_keyboard=[[InlineKeyboardButton(text="✅ Опубликовано", callback_data=f"mark_published_{fb.id}")]]
@@ -2,10 +2,11 @@ from aiogram import Router, F
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
-from app.db.session import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import Feedback, User
 from app.utils.roles import get_user_role
-from app.config import ADMIN_IDS as ADMINS
+from app.utils.admins import admin_registry
 from app.utils.format import format_user_info
 
 router = Router()
@@ -26,8 +27,8 @@ class HideChatStates(StatesGroup):
 
 
 @router.message(F.text == "💬 Болталка")
-async def chat_panel(message: Message):
-    role = get_user_role(message.from_user.id)
+async def chat_panel(message: Message, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет доступа к болталке.")
 
@@ -43,17 +44,16 @@ async def chat_panel(message: Message):
 
 
 @router.callback_query(F.data == "chat_unpublished")
-async def show_unpublished_chats(call: CallbackQuery):
-    session = Session()
+async def show_unpublished_chats(call: CallbackQuery, session: AsyncSession):
     admin_id = call.from_user.id
 
-    chats = session.query(Feedback).filter(
+    chats = (await session.scalars(select(Feedback).filter(
         Feedback.request_type == 'chat',
         Feedback.can_publish == True,
         Feedback.is_published == False,
         Feedback.is_hidden == False,
         ~Feedback.read_by.contains(str(admin_id))
-    ).all()
+    ))).all()
 
     if not chats:
         return await call.message.edit_text("✅ Все запросы опубликованы или прочитаны!")
@@ -61,7 +61,7 @@ async def show_unpublished_chats(call: CallbackQuery):
     text = "📝 <b>Неопубликованные запросы:</b>\n\n"
     for chat in chats:
         date_str = chat.created_at.strftime("%d.%m.%Y %H:%M")
-        user = session.query(User).filter_by(user_id=chat.user_id).first()
+        user = await session.scalar(select(User).filter_by(user_id=chat.user_id))
         user_info = format_user_info(user, chat.include_profile)
 
         text += f"🆔 <b>ID {chat.id}</b> | 📅 {date_str}{f' | 👤 {user_info}' if user_info else ''}\n{chat.text}\n\n"
@@ -70,13 +70,12 @@ async def show_unpublished_chats(call: CallbackQuery):
 
 
 @router.callback_query(F.data == "chat_all")
-async def show_all_chats(call: CallbackQuery):
-    session = Session()
+async def show_all_chats(call: CallbackQuery, session: AsyncSession):
     admin_id = call.from_user.id
-    chats = session.query(Feedback).filter(
+    chats = (await session.scalars(select(Feedback).filter(
         Feedback.request_type == 'chat',
         Feedback.is_hidden == False
-    ).all()
+    ))).all()
 
     if not chats:
         return await call.message.edit_text("❌ Запросов в болталке пока нет.")
@@ -92,7 +91,7 @@ async def show_all_chats(call: CallbackQuery):
         else:
             status = "📝 Ожидает публикации"
 
-        user = session.query(User).filter_by(user_id=chat.user_id).first()
+        user = await session.scalar(select(User).filter_by(user_id=chat.user_id))
         user_info = format_user_info(user, chat.include_profile)
 
         text += f"{status} | 🆔 <b>ID {chat.id}</b> | 📅 {date_str}{f' | 👤 {user_info}' if user_info else ''}\n{chat.text}\n\n"
@@ -101,12 +100,11 @@ async def show_all_chats(call: CallbackQuery):
 
 
 @router.callback_query(F.data == "chat_hidden")
-async def show_hidden_chats(call: CallbackQuery):
-    session = Session()
-    chats = session.query(Feedback).filter(
+async def show_hidden_chats(call: CallbackQuery, session: AsyncSession):
+    chats = (await session.scalars(select(Feedback).filter(
         Feedback.request_type == 'chat',
         Feedback.is_hidden == True
-    ).all()
+    ))).all()
 
     if not chats:
         return await call.message.edit_text("❌ Скрытых запросов нет.")
@@ -123,7 +121,7 @@ async def show_hidden_chats(call: CallbackQuery):
         else:
             status = "📝"
 
-        user = session.query(User).filter_by(user_id=chat.user_id).first()
+        user = await session.scalar(select(User).filter_by(user_id=chat.user_id))
 
         if chat.include_profile and user and user.consent:
             user_info = format_user_info(user, chat.include_profile)
@@ -142,11 +140,10 @@ async def back_from_chat(call: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("mark_published_"))
-async def mark_published_callback(call: CallbackQuery, state: FSMContext):
+async def mark_published_callback(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     chat_id = int(call.data.split("_")[-1])
 
-    session = Session()
-    chat = session.query(Feedback).get(chat_id)
+    chat = await session.get(Feedback, chat_id)
 
     if not chat:
         await call.answer("Запрос не найден")
@@ -168,18 +165,17 @@ async def mark_published_callback(call: CallbackQuery, state: FSMContext):
 
 
 @router.message(MarkPublishedStates.waiting_post_link)
-async def process_post_link(message: Message, state: FSMContext):
+async def process_post_link(message: Message, state: FSMContext, session: AsyncSession):
     post_link = message.text.strip()
     data = await state.get_data()
     chat_id = data.get("chat_id")
 
-    session = Session()
-    chat = session.query(Feedback).get(chat_id)
+    chat = await session.get(Feedback, chat_id)
 
     if chat:
         chat.is_published = True
         chat.post_link = post_link
-        session.commit()
+        await session.commit()
 
         # Отправляем уведомление пользователю
         try:
@@ -198,8 +194,8 @@ async def process_post_link(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "/mark_published")
-async def start_mark_published(message: Message, state: FSMContext):
-    role = get_user_role(message.from_user.id)
+async def start_mark_published(message: Message, state: FSMContext, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет прав для этой команды.")
 
@@ -208,15 +204,14 @@ async def start_mark_published(message: Message, state: FSMContext):
 
 
 @router.message(MarkPublishedStates.waiting_chat_id)
-async def process_mark_published(message: Message, state: FSMContext):
+async def process_mark_published(message: Message, state: FSMContext, session: AsyncSession):
     try:
         chat_id = int(message.text.strip())
     except ValueError:
         await message.answer("❌ ID должен быть числом. Попробуй еще раз.")
         return
 
-    session = Session()
-    chat = session.query(Feedback).get(chat_id)
+    chat = await session.get(Feedback, chat_id)
 
     if not chat:
         await message.answer("❌ Запрос с таким ID не найден.")
@@ -239,8 +234,8 @@ async def process_mark_published(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "📝 Отметить опубликованным")
-async def mark_published_button(message: Message, state: FSMContext):
-    role = get_user_role(message.from_user.id)
+async def mark_published_button(message: Message, state: FSMContext, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет прав.")
 
@@ -249,8 +244,8 @@ async def mark_published_button(message: Message, state: FSMContext):
 
 
 @router.message(F.text.startswith("/hide_chat"))
-async def hide_chat_command(message: Message):
-    role = get_user_role(message.from_user.id)
+async def hide_chat_command(message: Message, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет прав для этой команды.")
 
@@ -260,8 +255,7 @@ async def hide_chat_command(message: Message):
         await message.answer("❌ Использование: /hide_chat <ID>")
         return
 
-    session = Session()
-    chat = session.query(Feedback).get(chat_id)
+    chat = await session.get(Feedback, chat_id)
 
     if not chat:
         await message.answer("❌ Запрос с таким ID не найден.")
@@ -272,21 +266,20 @@ async def hide_chat_command(message: Message):
         return
 
     chat.is_hidden = True
-    session.commit()
+    await session.commit()
 
     await message.answer(f"✅ Запрос ID {chat_id} скрыт!")
 
 
 @router.message(HideChatStates.waiting_chat_id)
-async def process_hide_chat(message: Message, state: FSMContext):
+async def process_hide_chat(message: Message, state: FSMContext, session: AsyncSession):
     try:
         chat_id = int(message.text.strip())
     except ValueError:
         await message.answer("❌ ID должен быть числом. Попробуй еще раз.")
         return
 
-    session = Session()
-    chat = session.query(Feedback).get(chat_id)
+    chat = await session.get(Feedback, chat_id)
 
     if not chat:
         await message.answer("❌ Запрос с таким ID не найден.")
@@ -299,7 +292,7 @@ async def process_hide_chat(message: Message, state: FSMContext):
         return
 
     chat.is_hidden = True
-    session.commit()
+    await session.commit()
 
     await message.answer(f"✅ Запрос ID {chat_id} скрыт!")
     await state.clear()
@@ -1,11 +1,12 @@
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
-from app.db.session import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram.fsm.state import State, StatesGroup
 from app.db.models import Feedback, User
 from app.utils.roles import get_user_role
-from app.config import ADMIN_IDS as ADMINS
+from app.utils.admins import admin_registry
 from app.utils.format import format_user_info
 
 router = Router()
@@ -20,8 +21,8 @@ class HideFeedbackStates(StatesGroup):
 
 
 @router.message(F.text == "💌 Отзывы")
-async def feedback_panel(message: Message):
-    role = get_user_role(message.from_user.id)
+async def feedback_panel(message: Message, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет доступа к отзывам.")
 
@@ -37,15 +38,14 @@ async def feedback_panel(message: Message):
 
 
 @router.callback_query(F.data == "feedback_unread")
-async def show_unread_feedbacks(call: CallbackQuery):
-    session = Session()
+async def show_unread_feedbacks(call: CallbackQuery, session: AsyncSession):
     admin_id = call.from_user.id
 
-    feedbacks = session.query(Feedback).filter(
+    feedbacks = (await session.scalars(select(Feedback).filter(
         Feedback.request_type == 'feedback',
         Feedback.is_hidden == False,
         ~Feedback.read_by.contains(str(admin_id))
-    ).all()
+    ))).all()
 
     if not feedbacks:
         return await call.message.edit_text("✅ Все отзывы прочитаны!")
@@ -53,7 +53,7 @@ async def show_unread_feedbacks(call: CallbackQuery):
     text = "📩 <b>Непрочитанные отзывы:</b>\n\n"
     for fb in feedbacks:
         date_str = fb.created_at.strftime("%d.%m.%Y %H:%M")
-        user = session.query(User).filter_by(user_id=fb.user_id).first()
+        user = await session.scalar(select(User).filter_by(user_id=fb.user_id))
         user_info = format_user_info(user, fb.include_profile)
 
         text += f"🆔 <b>ID {fb.id}</b> | 📅 {date_str}{f' | 👤 {user_info}' if user_info else ''}\n{fb.text}\n\n"
@@ -62,13 +62,12 @@ async def show_unread_feedbacks(call: CallbackQuery):
 
 
 @router.callback_query(F.data == "feedback_all")
-async def show_all_feedbacks(call: CallbackQuery):
-    session = Session()
+async def show_all_feedbacks(call: CallbackQuery, session: AsyncSession):
     admin_id = call.from_user.id
-    feedbacks = session.query(Feedback).filter(
+    feedbacks = (await session.scalars(select(Feedback).filter(
         Feedback.request_type == 'feedback',
         Feedback.is_hidden == False
-    ).all()
+    ))).all()
 
     if not feedbacks:
         return await call.message.edit_text("❌ Отзывов пока нет.")
@@ -84,10 +83,10 @@ async def show_all_feedbacks(call: CallbackQuery):
             status_icon = "📩"
 
         read_count = len(read_by_list)
-        total_admins = len(ADMINS)
+        total_admins = len(await admin_registry.get(session))
         status_text = f"{status_icon} ({read_count}/{total_admins})"
 
-        user = session.query(User).filter_by(user_id=fb.user_id).first()
+        user = await session.scalar(select(User).filter_by(user_id=fb.user_id))
         user_info = format_user_info(user, fb.include_profile)
 
         text += f"{status_text} | 🆔 <b>ID {fb.id}</b> | 📅 {date_str}{f' | 👤 {user_info}' if user_info else ''}\n{fb.text}\n\n"
@@ -96,12 +95,11 @@ async def show_all_feedbacks(call: CallbackQuery):
 
 
 @router.callback_query(F.data == "feedback_hidden")
-async def show_hidden_feedbacks(call: CallbackQuery):
-    session = Session()
-    feedbacks = session.query(Feedback).filter(
+async def show_hidden_feedbacks(call: CallbackQuery, session: AsyncSession):
+    feedbacks = (await session.scalars(select(Feedback).filter(
         Feedback.request_type == 'feedback',
         Feedback.is_hidden == True
-    ).all()
+    ))).all()
 
     if not feedbacks:
         return await call.message.edit_text("❌ Скрытых отзывов нет.")
@@ -114,7 +112,7 @@ async def show_hidden_feedbacks(call: CallbackQuery):
         read_count = len(fb.read_by.split(",")) if fb.read_by else 0
         status = "✅" if read_count > 0 else "📩"
 
-        user = session.query(User).filter_by(user_id=fb.user_id).first()
+        user = await session.scalar(select(User).filter_by(user_id=fb.user_id))
 
         if fb.include_profile and user and user.consent:
             user_info = format_user_info(user, fb.include_profile)
@@ -133,8 +131,8 @@ async def back_from_feedback(call: CallbackQuery):
 
 
 @router.message(F.text == "/mark_read")
-async def start_mark_read(message: Message, state: FSMContext):
-    role = get_user_role(message.from_user.id)
+async def start_mark_read(message: Message, state: FSMContext, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет прав для этой команды.")
 
@@ -143,7 +141,7 @@ async def start_mark_read(message: Message, state: FSMContext):
 
 
 @router.message(MarkReadStates.waiting_feedback_id)
-async def process_mark_read(message: Message, state: FSMContext):
+async def process_mark_read(message: Message, state: FSMContext, session: AsyncSession):
     try:
         feedback_id = int(message.text.strip())
     except ValueError:
@@ -151,8 +149,7 @@ async def process_mark_read(message: Message, state: FSMContext):
         return
 
     admin_id = message.from_user.id
-    session = Session()
-    fb = session.query(Feedback).get(feedback_id)
+    fb = await session.get(Feedback, feedback_id)
 
     if not fb:
         await message.answer("❌ Отзыв с таким ID не найден.")
@@ -168,10 +165,10 @@ async def process_mark_read(message: Message, state: FSMContext):
     if str(admin_id) not in read_by:
         read_by.append(str(admin_id))
         fb.read_by = ",".join(read_by)
-        session.commit()
+        await session.commit()
 
         read_count = len(read_by)
-        total_admins = len(ADMINS)
+        total_admins = len(await admin_registry.get(session))
 
         await message.answer(
             f"✅ Отзыв ID {feedback_id} отмечен как прочитанный!\n"
@@ -184,8 +181,8 @@ async def process_mark_read(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "📝 Отметить прочитанным")
-async def mark_read_button(message: Message, state: FSMContext):
-    role = get_user_role(message.from_user.id)
+async def mark_read_button(message: Message, state: FSMContext, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет прав.")
 
@@ -194,8 +191,8 @@ async def mark_read_button(message: Message, state: FSMContext):
 
 
 @router.message(F.text.startswith("/hide_feedback"))
-async def hide_feedback_command(message: Message):
-    role = get_user_role(message.from_user.id)
+async def hide_feedback_command(message: Message, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет прав для этой команды.")
 
@@ -205,8 +202,7 @@ async def hide_feedback_command(message: Message):
         await message.answer("❌ Использование: /hide_feedback <ID>")
         return
 
-    session = Session()
-    fb = session.query(Feedback).get(feedback_id)
+    fb = await session.get(Feedback, feedback_id)
 
     if not fb:
         await message.answer("❌ Отзыв с таким ID не найден.")
@@ -217,21 +213,20 @@ async def hide_feedback_command(message: Message):
         return
 
     fb.is_hidden = True
-    session.commit()
+    await session.commit()
 
     await message.answer(f"✅ Отзыв ID {feedback_id} скрыт!")
 
 
 @router.message(HideFeedbackStates.waiting_feedback_id)
-async def process_hide_feedback(message: Message, state: FSMContext):
+async def process_hide_feedback(message: Message, state: FSMContext, session: AsyncSession):
     try:
         feedback_id = int(message.text.strip())
     except ValueError:
         await message.answer("❌ ID должен быть числом. Попробуй еще раз.")
         return
 
-    session = Session()
-    fb = session.query(Feedback).get(feedback_id)
+    fb = await session.get(Feedback, feedback_id)
 
     if not fb:
         await message.answer("❌ Отзыв с таким ID не найден.")
@@ -244,7 +239,7 @@ async def process_hide_feedback(message: Message, state: FSMContext):
         return
 
     fb.is_hidden = True
-    session.commit()
+    await session.commit()
 
     await message.answer(f"✅ Отзыв ID {feedback_id} скрыт!")
     await state.clear()
\ No newline at end of file
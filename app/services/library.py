@@ -4,7 +4,8 @@ from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 
-from app.db.session import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import Article
 
 router = Router()
@@ -12,11 +13,11 @@ router = Router()
 class LibraryStates(StatesGroup):
     reading = State()
 
-def get_ordered_articles(session):
-    return session.query(Article).order_by(Article.date.asc(), Article.id.asc()).all()
+async def get_ordered_articles(session: AsyncSession):
+    return (await session.scalars(select(Article).order_by(Article.date.asc(), Article.id.asc()))).all()
 
-def list_articles_text(session) -> str:
-    articles = get_ordered_articles(session)
+async def list_articles_text(session: AsyncSession) -> str:
+    articles = await get_ordered_articles(session)
     if not articles:
         return "📚 Библиотека пока пуста."
     text = "📚 Список статей:\n\n"
@@ -26,8 +27,7 @@ def list_articles_text(session) -> str:
     return text
 
 @router.message(F.text == "📚 Библиотека")
-async def open_library(message: Message, state: FSMContext):
-    session = Session()
+async def open_library(message: Message, state: FSMContext, session: AsyncSession):
     await state.set_state(LibraryStates.reading)
 
     markup = ReplyKeyboardMarkup(
@@ -39,18 +39,17 @@ async def open_library(message: Message, state: FSMContext):
         "📖 Здесь собраны статьи проекта «Заботать!». Мы опираемся на научные источники, "
         "но объясняем простым языком."
     )
-    await message.answer(list_articles_text(session), reply_markup=markup)
+    await message.answer(await list_articles_text(session), reply_markup=markup)
 
 
 @router.message(LibraryStates.reading, F.text.regexp(r'^\d+$'))
-async def read_article_by_number(message: Message, state: FSMContext):
+async def read_article_by_number(message: Message, state: FSMContext, session: AsyncSession):
     current = await state.get_state()
     if current != LibraryStates.reading:
         return
 
     n = int(message.text.strip())
-    session = Session()
-    articles = get_ordered_articles(session)
+    articles = await get_ordered_articles(session)
     if n < 1 or n > len(articles):
         return await message.answer("⚠️ Статья с таким номером не найдена. Проверь список и номер.")
 
@@ -65,9 +64,9 @@ async def read_article_by_number(message: Message, state: FSMContext):
     await message.answer(text, parse_mode="HTML")
 
 @router.message(LibraryStates.reading, F.text == "⬅️ Назад")
-async def back_from_library(message: Message, state: FSMContext):
+async def back_from_library(message: Message, state: FSMContext, session: AsyncSession):
     await state.clear()
     from app.keyboards import get_main_menu
     from app.utils.roles import get_user_role
-    role = get_user_role(message.from_user.id)
+    role = await get_user_role(session, message.from_user.id)
     await message.answer("Главное меню:", reply_markup=get_main_menu(role))
@@ -7,7 +7,8 @@ from aiogram.fsm.context import FSMContext
 
 from datetime import datetime
 
-from app.db.session import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import Article
 from app.utils.roles import get_user_role
 
@@ -25,11 +26,11 @@ class EditArticleStates(StatesGroup):
     waiting_for_value = State()
 
 # Helpers
-def get_ordered_articles(session):
-    return session.query(Article).order_by(Article.date.asc(), Article.id.asc()).all()
+async def get_ordered_articles(session: AsyncSession):
+    return (await session.scalars(select(Article).order_by(Article.date.asc(), Article.id.asc()))).all()
 
-def list_articles_text(session) -> str:
-    articles = get_ordered_articles(session)
+async def list_articles_text(session: AsyncSession) -> str:
+    articles = await get_ordered_articles(session)
     if not articles:
         return "📚 В библиотеке пока нет статей."
     text = "📚 Список статей:\n\n"
@@ -39,8 +40,8 @@ def list_articles_text(session) -> str:
 
 # === Add article (step-by-step) ===
 @router.message(Command("add_article"))
-async def add_article_start(message: Message, state: FSMContext):
-    if get_user_role(message.from_user.id) < 1:
+async def add_article_start(message: Message, state: FSMContext, session: AsyncSession):
+    if await get_user_role(session, message.from_user.id) < 1:
         return await message.answer("⛔ У тебя нет прав.")
     await message.answer("📝 Введи заголовок статьи:")
     await state.set_state(AddArticleStates.waiting_for_title)
@@ -64,14 +65,13 @@ async def add_link(message: Message, state: FSMContext):
     await state.set_state(AddArticleStates.waiting_for_date)
 
 @router.message(AddArticleStates.waiting_for_date)
-async def add_date(message: Message, state: FSMContext):
+async def add_date(message: Message, state: FSMContext, session: AsyncSession):
     txt = message.text.strip()
     try:
         dt = datetime.strptime(txt, "%Y-%m-%d")
     except ValueError:
         return await message.answer("❌ Неверный формат даты. Используй YYYY-MM-DD.")
     data = await state.get_data()
-    session = Session()
     article = Article(
         title=data["title"],
         description=data["description"],
@@ -79,45 +79,43 @@ async def add_date(message: Message, state: FSMContext):
         date=dt
     )
     session.add(article)
-    session.commit()
+    await session.commit()
     await state.clear()
-    await message.answer("✅ Статья добавлена!\n\n" + list_articles_text(session))
+    await message.answer("✅ Статья добавлена!\n\n" + await list_articles_text(session))
 
 # === Delete article ===
 @router.message(Command("del_art"))
-async def delete_article(message: Message):
-    if get_user_role(message.from_user.id) < 1:
+async def delete_article(message: Message, session: AsyncSession):
+    if await get_user_role(session, message.from_user.id) < 1:
         return await message.answer("⛔ У тебя нет прав.")
     parts = message.text.split()
-    session = Session()
     if len(parts) < 2:
-        return await message.answer("❗ Укажи номер статьи для удаления.\n\n" + list_articles_text(session))
+        return await message.answer("❗ Укажи номер статьи для удаления.\n\n" + await list_articles_text(session))
     try:
         num = int(parts[1])
     except ValueError:
         return await message.answer("❌ Номер должен быть целым числом.")
-    articles = get_ordered_articles(session)
+    articles = await get_ordered_articles(session)
     if num < 1 or num > len(articles):
         return await message.answer("❌ Статья с таким номером не найдена.")
     article = articles[num-1]
-    session.delete(article)
-    session.commit()
-    await message.answer("🗑 Статья удалена.\n\n" + list_articles_text(session))
+    await session.delete(article)
+    await session.commit()
+    await message.answer("🗑 Статья удалена.\n\n" + await list_articles_text(session))
 
 # === Edit article (command) ===
 @router.message(Command("edit_art"))
-async def edit_art_start(message: Message, state: FSMContext):
-    if get_user_role(message.from_user.id) < 1:
+async def edit_art_start(message: Message, state: FSMContext, session: AsyncSession):
+    if await get_user_role(session, message.from_user.id) < 1:
         return await message.answer("⛔ У тебя нет прав.")
     parts = message.text.split()
-    session = Session()
     if len(parts) < 2:
-        return await message.answer("❗ Укажи номер статьи для редактирования.\n\n" + list_articles_text(session))
+        return await message.answer("❗ Укажи номер статьи для редактирования.\n\n" + await list_articles_text(session))
     try:
         num = int(parts[1])
     except ValueError:
         return await message.answer("❌ Номер должен быть целым числом.")
-    articles = get_ordered_articles(session)
+    articles = await get_ordered_articles(session)
     if num < 1 or num > len(articles):
         return await message.answer("❌ Статья с таким номером не найдена.")
     article = articles[num-1]
@@ -135,10 +133,9 @@ async def edit_field(message: Message, state: FSMContext):
     await message.answer(f"Введи новое значение для поля {fld}:")
 
 @router.message(EditArticleStates.waiting_for_value)
-async def edit_value(message: Message, state: FSMContext):
+async def edit_value(message: Message, state: FSMContext, session: AsyncSession):
     data = await state.get_data()
-    session = Session()
-    article = session.query(Article).filter_by(id=data["article_id"]).first()
+    article = await session.scalar(select(Article).filter_by(id=data["article_id"]))
     if not article:
         await state.clear()
         return await message.answer("❌ Статья не найдена.")
@@ -152,6 +149,6 @@ async def edit_value(message: Message, state: FSMContext):
         article.date = new_dt
     else:
         setattr(article, field, new_raw)
-    session.commit()
+    await session.commit()
     await state.clear()
-    await message.answer("✅ Статья обновлена.\n\n" + list_articles_text(session))
+    await message.answer("✅ Статья обновлена.\n\n" + await list_articles_text(session))
@@ -3,9 +3,9 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
 
-from app.db.session import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import Feedback
-from app.config import ADMIN_IDS as ADMINS
+from app.utils.admins import admin_registry
 from app.keyboards import get_support_menu
 
 router = Router()
@@ -22,8 +22,7 @@ async def start_question(message: Message, state: FSMContext):
     await state.set_state(QuestionStates.waiting_question)
 
 @router.message(QuestionStates.waiting_question)
-async def process_question(message: Message, state: FSMContext):
-    session = Session()
+async def process_question(message: Message, state: FSMContext, session: AsyncSession):
     fb = Feedback(
         user_id=message.from_user.id,
         text=message.text,
@@ -33,7 +32,7 @@ async def process_question(message: Message, state: FSMContext):
         is_published=False
     )
     session.add(fb)
-    session.commit()
+    await session.commit()
 
     await message.answer(
         "💛 Спасибо! Твой вопрос отправлен администрации. Ответим в ближайшее время.",
@@ -41,7 +40,7 @@ async def process_question(message: Message, state: FSMContext):
     )
 
     # Уведомляем админов
-    for admin_id in ADMINS:
+    for admin_id in await admin_registry.get(session):
         markup = InlineKeyboardMarkup(
             inline_keyboard=[[InlineKeyboardButton(text="📝 Ответить", callback_data=f"answer_question_{fb.id}")]]
         )
@@ -2,10 +2,11 @@ from aiogram import Router, F
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
-from app.db.session import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import Feedback, User
 from app.utils.roles import get_user_role
-from app.config import ADMIN_IDS as ADMINS
+from app.utils.admins import admin_registry
 
 router = Router()
 
@@ -19,8 +20,8 @@ class HideQuestionStates(StatesGroup):
 
 
 @router.message(F.text == "❓ Вопросы админам")
-async def question_panel(message: Message):
-    role = get_user_role(message.from_user.id)
+async def question_panel(message: Message, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет доступа к вопросам.")
 
@@ -36,15 +37,14 @@ async def question_panel(message: Message):
 
 
 @router.callback_query(F.data == "question_unanswered")
-async def show_unanswered_questions(call: CallbackQuery):
-    session = Session()
+async def show_unanswered_questions(call: CallbackQuery, session: AsyncSession):
     admin_id = call.from_user.id
 
-    questions = session.query(Feedback).filter(
+    questions = (await session.scalars(select(Feedback).filter(
         Feedback.request_type == 'question',
         Feedback.is_hidden == False,
         ~Feedback.read_by.contains(str(admin_id))
-    ).all()
+    ))).all()
 
     if not questions:
         return await call.message.edit_text("✅ Все вопросы отвечены!")
@@ -58,13 +58,12 @@ async def show_unanswered_questions(call: CallbackQuery):
 
 
 @router.callback_query(F.data == "question_all")
-async def show_all_questions(call: CallbackQuery):
-    session = Session()
+async def show_all_questions(call: CallbackQuery, session: AsyncSession):
     admin_id = call.from_user.id
-    questions = session.query(Feedback).filter(
+    questions = (await session.scalars(select(Feedback).filter(
         Feedback.request_type == 'question',
         Feedback.is_hidden == False
-    ).all()
+    ))).all()
 
     if not questions:
         return await call.message.edit_text("❌ Вопросов пока нет.")
@@ -80,7 +79,7 @@ async def show_all_questions(call: CallbackQuery):
             status_icon = "📩"
 
         read_count = len(read_by_list)
-        total_admins = len(ADMINS)
+        total_admins = len(await admin_registry.get(session))
         status_text = f"{status_icon} ({read_count}/{total_admins})"
 
         text += f"{status_text} | 🆔 <b>ID {q.id}</b> | 📅 {date_str}\n{q.text}\n\n"
@@ -89,12 +88,11 @@ async def show_all_questions(call: CallbackQuery):
 
 
 @router.callback_query(F.data == "question_hidden")
-async def show_hidden_questions(call: CallbackQuery):
-    session = Session()
-    questions = session.query(Feedback).filter(
+async def show_hidden_questions(call: CallbackQuery, session: AsyncSession):
+    questions = (await session.scalars(select(Feedback).filter(
         Feedback.request_type == 'question',
         Feedback.is_hidden == True
-    ).all()
+    ))).all()
 
     if not questions:
         return await call.message.edit_text("❌ Скрытых вопросов нет.")
@@ -117,11 +115,10 @@ async def back_from_question(call: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("answer_question_"))
-async def answer_question_callback(call: CallbackQuery, state: FSMContext):
+async def answer_question_callback(call: CallbackQuery, state: FSMContext, session: AsyncSession):
     question_id = int(call.data.split("_")[-1])
 
-    session = Session()
-    question = session.query(Feedback).get(question_id)
+    question = await session.get(Feedback, question_id)
 
     if not question:
         await call.answer("Вопрос не найден")
@@ -136,7 +133,7 @@ async def answer_question_callback(call: CallbackQuery, state: FSMContext):
     if str(call.from_user.id) not in read_by:
         read_by.append(str(call.from_user.id))
         question.read_by = ",".join(read_by)
-        session.commit()
+        await session.commit()
 
     await state.update_data(question_id=question_id, user_id=question.user_id)
     await call.message.answer("Введи ответ на вопрос:")
@@ -166,8 +163,8 @@ async def process_answer(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "📝 Ответить на вопрос")
-async def answer_question_button(message: Message, state: FSMContext):
-    role = get_user_role(message.from_user.id)
+async def answer_question_button(message: Message, state: FSMContext, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет прав.")
 
@@ -176,15 +173,14 @@ async def answer_question_button(message: Message, state: FSMContext):
 
 
 @router.message(HideQuestionStates.waiting_question_id)
-async def process_question_id(message: Message, state: FSMContext):
+async def process_question_id(message: Message, state: FSMContext, session: AsyncSession):
     try:
         question_id = int(message.text.strip())
     except ValueError:
         await message.answer("❌ ID должен быть числом. Попробуй еще раз.")
         return
 
-    session = Session()
-    question = session.query(Feedback).get(question_id)
+    question = await session.get(Feedback, question_id)
 
     if not question:
         await message.answer("❌ Вопрос с таким ID не найден.")
@@ -201,7 +197,7 @@ async def process_question_id(message: Message, state: FSMContext):
     if str(message.from_user.id) not in read_by:
         read_by.append(str(message.from_user.id))
         question.read_by = ",".join(read_by)
-        session.commit()
+        await session.commit()
 
     await state.update_data(question_id=question_id, user_id=question.user_id)
     await message.answer("Введи ответ на вопрос:")
@@ -209,8 +205,8 @@ async def process_question_id(message: Message, state: FSMContext):
 
 
 @router.message(F.text.startswith("/hide_question"))
-async def hide_question_command(message: Message):
-    role = get_user_role(message.from_user.id)
+async def hide_question_command(message: Message, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет прав для этой команды.")
 
@@ -220,8 +216,7 @@ async def hide_question_command(message: Message):
         await message.answer("❌ Использование: /hide_question <ID>")
         return
 
-    session = Session()
-    question = session.query(Feedback).get(question_id)
+    question = await session.get(Feedback, question_id)
 
     if not question:
         await message.answer("❌ Вопрос с таким ID не найден.")
@@ -232,21 +227,20 @@ async def hide_question_command(message: Message):
         return
 
     question.is_hidden = True
-    session.commit()
+    await session.commit()
 
     await message.answer(f"✅ Вопрос ID {question_id} скрыт!")
 
 
 @router.message(HideQuestionStates.waiting_question_id)
-async def process_hide_question(message: Message, state: FSMContext):
+async def process_hide_question(message: Message, state: FSMContext, session: AsyncSession):
     try:
         question_id = int(message.text.strip())
     except ValueError:
         await message.answer("❌ ID должен быть числом. Попробуй еще раз.")
         return
 
-    session = Session()
-    question = session.query(Feedback).get(question_id)
+    question = await session.get(Feedback, question_id)
 
     if not question:
         await message.answer("❌ Вопрос с таким ID не найден.")
@@ -259,7 +253,7 @@ async def process_hide_question(message: Message, state: FSMContext):
         return
 
     question.is_hidden = True
-    session.commit()
+    await session.commit()
 
     await message.answer(f"✅ Вопрос ID {question_id} скрыт!")
     await state.clear()
\ No newline at end of file
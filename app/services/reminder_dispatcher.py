@@ -0,0 +1,234 @@
+from collections import defaultdict, namedtuple
+from datetime import datetime
+import heapq
+import time
+
+import pytz
+
+from app.config import DEFAULT_TIMEZONE
+
+# Минут в сутках: ячейки колеса для напоминаний с фиксированным временем
+MINUTES_PER_DAY = 24 * 60
+
+# Всё, что нужно, чтобы посчитать следующий запуск interval/random напоминания без запроса к БД.
+# quiet — тихое время как пара минут суток (начало, конец) или None, zone — часовой пояс пользователя
+TimedSpec = namedtuple(
+    "TimedSpec", "id schedule_type interval_hours random_interval_hours quiet zone"
+)
+
+
+def parse_minute(time_str: str) -> int:
+    """'HH:MM' -> минута суток"""
+    hour, minute = map(int, time_str.split(':'))
+    return hour * 60 + minute
+
+
+def compile_quiet(start_time, end_time):
+    """Тихое время напоминания как (начало, конец) в минутах суток, None — если не задано"""
+    if not (start_time and end_time):
+        return None
+    return parse_minute(start_time), parse_minute(end_time)
+
+
+def in_quiet(minute_of_day: int, quiet) -> bool:
+    """Попадает ли минута в окно [начало, конец), окно может переходить через полночь"""
+    if quiet is None:
+        return False
+    start, end = quiet
+    if start < end:
+        return start <= minute_of_day < end
+    # Интервал переходит через полночь (например, 23:00-06:00)
+    return minute_of_day >= start or minute_of_day < end
+
+
+def utc_offset(zone: str, timestamp: float) -> int:
+    """Смещение часового пояса от UTC в минутах на момент timestamp"""
+    return int(datetime.fromtimestamp(timestamp, pytz.timezone(zone)).utcoffset().total_seconds()) // 60
+
+
+def quiet_length(quiet) -> int:
+    """Длина тихого окна в минутах"""
+    if quiet is None:
+        return 0
+    start, end = quiet
+    return (end - start) % MINUTES_PER_DAY or MINUTES_PER_DAY
+
+
+class ReminderDispatcher:
+    """Индекс напоминаний для минутного тика.
+
+    Фиксированное время лежит в колесе «минута суток UTC -> id напоминаний»: местное время
+    пользователя переводится в UTC один раз при добавлении, так что тик для всех поясов
+    делает один поиск. interval и random — в куче по времени следующего запуска (timestamp).
+    Из кучи удаляем лениво: запись действительна, только пока совпадает с next_fire."""
+
+    def __init__(self):
+        self.wheel = defaultdict(set)
+        self.slots = {}  # reminder_id -> минуты суток UTC, чтобы быстро убрать из колеса
+        self.heap = []
+        self.next_fire = {}  # reminder_id -> timestamp актуальной записи в куче
+        self.specs = {}  # reminder_id -> TimedSpec
+        self.quiet = {}  # reminder_id -> тихое время (только если задано)
+        self.quiet_skips = {}  # reminder_id -> сколько фиксированных времён выпало на тихое время
+        self.zones = {}  # reminder_id -> часовой пояс пользователя
+        self.members = defaultdict(set)  # часовой пояс -> id напоминаний
+        self.offsets = {}  # часовой пояс -> смещение от UTC в минутах, по которому разложено колесо
+
+    def __len__(self):
+        return len(self.slots) + len(self.next_fire)
+
+    def __contains__(self, reminder_id):
+        return reminder_id in self.slots or reminder_id in self.next_fire
+
+    def clear(self):
+        self.wheel.clear()
+        self.slots.clear()
+        self.heap.clear()
+        self.next_fire.clear()
+        self.specs.clear()
+        self.quiet.clear()
+        self.quiet_skips.clear()
+        self.zones.clear()
+        self.members.clear()
+        self.offsets.clear()
+
+    def add_fixed(self, reminder_id: int, minutes, quiet=None, replace: bool = True, zone: str = DEFAULT_TIMEZONE):
+        """minutes и quiet — в местном времени пользователя"""
+        # При загрузке в пустой индекс удалять нечего, replace=False экономит лишний проход
+        if replace:
+            self.remove(reminder_id)
+        offset = self._join_zone(reminder_id, zone)
+        minutes = set(minutes)
+        # Времена внутри тихого окна в колесо не попадают: ночью тик их даже не увидит
+        active = [minute for minute in minutes if not in_quiet(minute, quiet)]
+        if len(active) < len(minutes):
+            self.quiet_skips[reminder_id] = len(minutes) - len(active)
+        self._place(reminder_id, ((minute - offset) % MINUTES_PER_DAY for minute in active))
+        if quiet is not None:
+            self.quiet[reminder_id] = quiet
+
+    def add_timed(self, spec: TimedSpec, fire_at: float, replace: bool = True):
+        if replace:
+            self.remove(spec.id)
+        self._join_zone(spec.id, spec.zone)
+        self.specs[spec.id] = spec
+        if spec.quiet is not None:
+            self.quiet[spec.id] = spec.quiet
+        self.next_fire[spec.id] = fire_at
+        heapq.heappush(self.heap, (fire_at, spec.id))
+
+    def reschedule(self, reminder_id: int, fire_at: float):
+        """Переносит уже известное interval/random напоминание на новое время"""
+        self.next_fire[reminder_id] = fire_at
+        heapq.heappush(self.heap, (fire_at, reminder_id))
+
+    def remove(self, reminder_id: int, compact: bool = True):
+        """Убирает напоминание за O(его времён), без обхода всего индекса"""
+        self._unplace(reminder_id)
+        zone = self.zones.pop(reminder_id, None)
+        if zone is not None:
+            members = self.members[zone]
+            members.discard(reminder_id)
+            if not members:
+                del self.members[zone]
+                del self.offsets[zone]
+        self.specs.pop(reminder_id, None)
+        self.quiet.pop(reminder_id, None)
+        self.quiet_skips.pop(reminder_id, None)
+        if self.next_fire.pop(reminder_id, None) is not None and compact:
+            self._compact()
+
+    def remove_many(self, reminder_ids):
+        """Массовое удаление: кучу пересобираем не больше одного раза"""
+        for reminder_id in reminder_ids:
+            self.remove(reminder_id, compact=False)
+        self._compact()
+
+    def describe(self, reminder_id: int):
+        """Где лежит напоминание: местные минуты суток, время следующего запуска и часовой пояс"""
+        zone = self.zones.get(reminder_id)
+        minutes = self.slots.get(reminder_id)
+        if minutes is not None:
+            minutes = tuple(sorted((minute + self.offsets[zone]) % MINUTES_PER_DAY for minute in minutes))
+        return minutes, self.next_fire.get(reminder_id), zone
+
+    def refresh_offsets(self, timestamp: float) -> int:
+        """Сверяет смещения поясов с текущими (переход на летнее время, изменения в базе поясов)
+        и перекладывает в колесе только напоминания изменившихся поясов. Возвращает их число"""
+        moved = 0
+        for zone, offset in list(self.offsets.items()):
+            current = utc_offset(zone, timestamp)
+            if current == offset:
+                continue
+            self.offsets[zone] = current
+            shift = current - offset
+            for reminder_id in self.members[zone]:
+                # interval и random хранят абсолютное время, сдвигать нужно только колесо
+                minutes = self._unplace(reminder_id)
+                if minutes is None:
+                    continue
+                self._place(reminder_id, ((minute - shift) % MINUTES_PER_DAY for minute in minutes))
+                moved += 1
+        return moved
+
+    def local_minute(self, reminder_id: int, utc_minute: int) -> int:
+        """Минута суток UTC -> минута суток по часам пользователя"""
+        return (utc_minute + self.offsets[self.zones[reminder_id]]) % MINUTES_PER_DAY
+
+    def skipped_per_day(self) -> int:
+        """Сколько запусков в сутки не происходит из-за тихого времени (считается по расписаниям)"""
+        skipped = sum(self.quiet_skips.values())
+        for spec in self.specs.values():
+            if spec.schedule_type == 'interval' and spec.quiet is not None:
+                skipped += quiet_length(spec.quiet) // (spec.interval_hours * 60)
+        return skipped
+
+    def split_quiet(self, reminder_ids, utc_minute: int):
+        """Делит напоминания на те, что можно отправить сейчас, и те, что в тихом времени (по их поясу)"""
+        quiet = {reminder_id for reminder_id in reminder_ids
+                 if reminder_id in self.quiet
+                 and in_quiet(self.local_minute(reminder_id, utc_minute), self.quiet[reminder_id])}
+        return set(reminder_ids) - quiet, quiet
+
+    def due_fixed(self, minute_of_day: int) -> set:
+        return set(self.wheel.get(minute_of_day % MINUTES_PER_DAY, ()))
+
+    def pop_due_timed(self, now: float) -> list:
+        """Снимает с кучи всё, что пора запускать: [(timestamp, TimedSpec)]"""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            fire_at, reminder_id = heapq.heappop(self.heap)
+            if self.next_fire.get(reminder_id) != fire_at:
+                continue  # запись устарела после переноса или удаления
+            del self.next_fire[reminder_id]
+            due.append((fire_at, self.specs[reminder_id]))
+        return due
+
+    def _join_zone(self, reminder_id: int, zone: str) -> int:
+        """Запоминает пояс напоминания, возвращает текущее смещение пояса"""
+        self.zones[reminder_id] = zone
+        self.members[zone].add(reminder_id)
+        if zone not in self.offsets:
+            self.offsets[zone] = utc_offset(zone, time.time())
+        return self.offsets[zone]
+
+    def _place(self, reminder_id: int, minutes):
+        minutes = tuple(sorted(set(minutes)))
+        self.slots[reminder_id] = minutes
+        for minute in minutes:
+            self.wheel[minute].add(reminder_id)
+
+    def _unplace(self, reminder_id: int):
+        minutes = self.slots.pop(reminder_id, None)
+        for minute in minutes or ():
+            bucket = self.wheel[minute]
+            bucket.discard(reminder_id)
+            if not bucket:
+                del self.wheel[minute]
+        return minutes
+
+    def _compact(self):
+        # Не даём куче разрастись из-за устаревших записей
+        if len(self.heap) > 2 * len(self.next_fire) + 64:
+            self.heap = [(fire_at, reminder_id) for reminder_id, fire_at in self.next_fire.items()]
+            heapq.heapify(self.heap)
@@ -1,40 +1,72 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.interval import IntervalTrigger
-from apscheduler.triggers.date import DateTrigger
-from datetime import datetime, time, timedelta
-from sqlalchemy import func
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, func
 import json
 import random
 import pytz
 import asyncio
 import logging
-import threading
+import time
 
 from app.db.session import Session
-from app.db.models import UserReminder, Quote, ReminderStat
-from app.config import BOT_TOKEN
-from aiogram import Bot
+from app.db.buffer import WriteBehindBuffer
+from app.db.models import User, UserReminder, ReminderStat, ReminderChange
+from app.config import (REMINDER_RATE, REMINDER_CONCURRENCY, REMINDER_MAX_RETRIES, REMINDER_BATCH_SIZE,
+                        REMINDER_STATS_FLUSH_SIZE, REMINDER_STATS_FLUSH_INTERVAL, REMINDER_CHANGES_RETENTION,
+                        REMINDER_SHARDS, WORKER_ID, SHARD_LEASE_TTL, REMINDER_LOAD_CHUNK)
+from app.services.broadcast_service import TokenBucket
+from app.services.reminder_shards import ShardLeases
+from app.services.reminder_dispatcher import (ReminderDispatcher, TimedSpec, MINUTES_PER_DAY, parse_minute,
+                                              compile_quiet, in_quiet, quiet_length)
+from app.utils.delivery import is_permanent_error, mark_unreachable
+from app.utils.quotes import quote_pool
+from app.utils.telegram import create_bot
+from app.utils.timezones import user_timezone
+from aiogram.exceptions import TelegramRetryAfter
 
 # Создаем бота глобально
-bot = Bot(token=BOT_TOKEN)
-# Используем AsyncIOScheduler для асинхронной работы
-scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
-msk_tz = pytz.timezone('Europe/Moscow')
+bot = create_bot()
+# Используем AsyncIOScheduler для асинхронной работы: в нём одно задание — минутный тик диспетчера.
+# Тик работает в UTC, местное время каждого пользователя учитывает индекс диспетчера
+scheduler = AsyncIOScheduler(timezone="UTC")
+dispatcher = ReminderDispatcher()
+# Этот процесс обслуживает только напоминания пользователей из арендованных шардов
+leases = ShardLeases(REMINDER_SHARDS, WORKER_ID, SHARD_LEASE_TTL)
+
+# Пропущенные запуски (например, после простоя) отправляем, если опоздали не больше чем на час
+MISFIRE_GRACE_TIME = 3600
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
 # Флаг для отслеживания состояния планировщика
-scheduler_lock = threading.Lock()
+scheduler_lock = asyncio.Lock()
+# Полная загрузка индекса не должна идти в двух местах одновременно и во время обработки тика
+load_lock = asyncio.Lock()
 scheduler_initialized = False
-
-
-def init_scheduler():
-    """Инициализация планировщика"""
+# Последняя обработанная минута и ещё не сохранённые в БД времена следующих запусков
+last_tick = None
+# Последняя применённая запись журнала изменений напоминаний
+last_change_id = 0
+pending_next_fire = {}
+# Счётчики тика: сколько запусков отправлено вовремя, с опозданием и пропущено совсем
+tick_stats = Counter()
+# Отправки, запущенные тиком: держим ссылки, чтобы задачи не собрал GC
+sending_tasks = set()
+# Общие для всех пачек ограничения: частота запросов к Telegram и число одновременных отправок
+reminder_bucket = TokenBucket(REMINDER_RATE)
+reminder_limit = asyncio.Semaphore(REMINDER_CONCURRENCY)
+# Статистика отправок копится в памяти и пишется в БД пачками
+reminder_stats = WriteBehindBuffer(ReminderStat, REMINDER_STATS_FLUSH_SIZE, REMINDER_STATS_FLUSH_INTERVAL)
+
+
+async def init_scheduler():
+    """Инициализация планировщика (вызывается из уже запущенного event loop)"""
     global scheduler_initialized
 
-    with scheduler_lock:
+    async with scheduler_lock:
         if scheduler_initialized:
             return
 
@@ -43,260 +75,452 @@ def init_scheduler():
             if scheduler.running:
                 scheduler.shutdown(wait=False)
 
-            # Запускаем планировщик
+            # Арендуем шарды и загружаем их активные напоминания в индекс диспетчера
+            await renew_leases()
+            await load_reminders()
+
+            scheduler.add_job(
+                tick,
+                CronTrigger(second=0, timezone='UTC'),
+                id="reminder_tick",
+                coalesce=True,
+                max_instances=1,
+                replace_existing=True
+            )
             scheduler.start()
+            reminder_stats.start()
             logger.info("Scheduler initialized successfully")
 
-            # Загружаем все активные напоминания
-            load_reminders()
-
             scheduler_initialized = True
 
         except Exception as e:
             logger.error(f"Failed to initialize scheduler: {e}")
 
 
-def load_reminders():
-    """Загружает все активные напоминания в планировщик"""
-    try:
-        with Session() as session:
-            reminders = session.query(UserReminder).filter_by(is_active=True).all()
-            for reminder in reminders:
-                schedule_reminder(reminder)
-            logger.info(f"Loaded {len(reminders)} reminders into scheduler")
-    except Exception as e:
-        logger.error(f"Failed to load reminders: {e}")
+async def load_reminders():
+    """Строит индекс диспетчера по активным напоминаниям, читая их из БД пачками.
 
+    Новый индекс собирается отдельно и подменяет старый целиком, так что тик
+    никогда не видит наполовину загруженный индекс. Возвращает (число напоминаний, секунды)."""
+    global dispatcher, last_change_id
 
-def schedule_reminder(reminder):
-    """Планирует напоминание в scheduler"""
-    try:
-        # Удаляем старые job'ы для этого напоминания
-        remove_reminder(reminder.id)
+    async with load_lock:
+        started = time.monotonic()
+        loaded = 0
+        try:
+            await flush_next_fire()
+            fresh = ReminderDispatcher()
+            async with Session() as session:
+                # Позицию в журнале берём до чтения напоминаний, чтобы не потерять изменения между запросами
+                change_id = await session.scalar(select(func.max(ReminderChange.id))) or 0
+                # Только поля расписания: строки без ORM-объектов читаются в разы быстрее
+                result = await session.stream(
+                    schedule_query()
+                    .where(
+                        UserReminder.is_active == True,
+                        (UserReminder.user_id % leases.shards).in_(leases.owned)
+                    )
+                    .execution_options(yield_per=REMINDER_LOAD_CHUNK)
+                )
+                async for chunk in result.partitions():
+                    for reminder in chunk:
+                        schedule_reminder(reminder, fresh, replace=False)
+                    loaded += len(chunk)
+                    elapsed = time.monotonic() - started
+                    logger.info(f"Loading reminders: {loaded} done, {loaded / elapsed:.0f}/s")
+
+            dispatcher = fresh
+            last_change_id = change_id
+            await flush_next_fire()
+        except Exception as e:
+            logger.error(f"Failed to load reminders: {e}")
 
-        if reminder.schedule_type == 'fixed':
-            times = json.loads(reminder.times)
-            for time_str in times:
-                hour, minute = map(int, time_str.split(':'))
+        elapsed = time.monotonic() - started
+        logger.info(f"Loaded {loaded} reminders into dispatcher in {elapsed:.2f}s")
+        return loaded, elapsed
 
-                # Создаем время напоминания
-                reminder_time = datetime.now(msk_tz).replace(hour=hour, minute=minute, second=0, microsecond=0)
 
-                # Если время уже прошло сегодня, планируем на завтра
-                if reminder_time < datetime.now(msk_tz):
-                    reminder_time += timedelta(days=1)
+# Поля UserReminder и пояс пользователя: этого достаточно для schedule_reminder
+SCHEDULE_COLUMNS = (
+    UserReminder.id, UserReminder.user_id, UserReminder.schedule_type, UserReminder.times,
+    UserReminder.interval_hours, UserReminder.random_interval_hours,
+    UserReminder.start_time, UserReminder.end_time, UserReminder.next_fire_at,
+    User.timezone, User.region
+)
 
-                trigger = CronTrigger(
-                    hour=reminder_time.hour,
-                    minute=reminder_time.minute,
-                    timezone='Europe/Moscow'
-                )
 
-                scheduler.add_job(
-                    async_send_reminder,
-                    trigger,
-                    args=[reminder.id],
-                    id=f"reminder_{reminder.id}_{time_str}",
-                    misfire_grace_time=3600,
-                    coalesce=True
-                )
-                logger.info(f"Scheduled reminder {reminder.id} for {reminder_time.strftime('%H:%M')}")
-        elif reminder.schedule_type == 'interval':
-            trigger = IntervalTrigger(hours=reminder.interval_hours, timezone='Europe/Moscow')
-            scheduler.add_job(
-                async_send_reminder,
-                trigger,
-                args=[reminder.id],
-                id=f"reminder_{reminder.id}_interval",
-                misfire_grace_time=3600,
-                coalesce=True
-            )
-            logger.info(f"Scheduled interval reminder {reminder.id} every {reminder.interval_hours} hours")
-        elif reminder.schedule_type == 'random':
-            # Для случайного расписания генерируем случайное время в пределах интервала
-            next_run_time = generate_random_time(reminder)
-            trigger = DateTrigger(run_date=next_run_time)
+def schedule_query():
+    return select(*SCHEDULE_COLUMNS).outerjoin(User, User.user_id == UserReminder.user_id)
 
-            scheduler.add_job(
-                async_send_reminder,
-                trigger,
-                args=[reminder.id],
-                id=f"reminder_{reminder.id}_random_{next_run_time.timestamp()}",
-                misfire_grace_time=3600,
-                coalesce=True
+
+def set_next_fire(spec: TimedSpec, fire_at: float, known: bool = False, target=None, replace: bool = True):
+    """Ставит interval/random напоминание в кучу и запоминает время для сохранения в БД"""
+    target = dispatcher if target is None else target
+    if known:
+        target.reschedule(spec.id, fire_at)
+    else:
+        target.add_timed(spec, fire_at, replace)
+    pending_next_fire[spec.id] = datetime.utcfromtimestamp(fire_at)
+
+
+def minute_of_day(timestamp: float, zone: str) -> int:
+    """Минута суток по часам пояса zone"""
+    moment = datetime.fromtimestamp(timestamp, pytz.timezone(zone))
+    return moment.hour * 60 + moment.minute
+
+
+def next_fire_time(spec: TimedSpec, after: float) -> float:
+    """Следующий запуск после after, который не попадает в тихое время"""
+    if spec.schedule_type != 'interval':
+        return generate_random_time(spec, datetime.fromtimestamp(after, pytz.timezone(spec.zone))).timestamp()
+
+    step = spec.interval_hours * 3600
+    next_at = after + step
+    # Запуски внутри тихого окна пропускаем, сохраняя шаг интервала
+    for _ in range(quiet_length(spec.quiet) // (spec.interval_hours * 60)):
+        if not in_quiet(minute_of_day(next_at, spec.zone), spec.quiet):
+            return next_at
+        next_at += step
+    # Шаг не меньше тихого окна (например, раз в сутки): переносим на конец окна
+    minute = minute_of_day(next_at, spec.zone)
+    if in_quiet(minute, spec.quiet):
+        next_at += ((spec.quiet[1] - minute) % MINUTES_PER_DAY) * 60 - next_at % 60
+    return next_at
+
+
+def schedule_reminder(reminder, target=None, replace: bool = True):
+    """Добавляет напоминание в индекс диспетчера (или в собираемый индекс target)"""
+    target = dispatcher if target is None else target
+    try:
+        # Строки 'HH:MM' разбираем один раз здесь, при тике работаем только с минутами суток
+        quiet = compile_quiet(reminder.start_time, reminder.end_time)
+        zone = user_timezone(reminder)
+        if reminder.schedule_type == 'fixed':
+            minutes = [parse_minute(time_str) for time_str in json.loads(reminder.times)]
+            target.add_fixed(reminder.id, minutes, quiet, replace, zone)
+            logger.debug(f"Scheduled reminder {reminder.id} for {reminder.times}")
+        elif reminder.schedule_type in ('interval', 'random'):
+            spec = TimedSpec(
+                reminder.id, reminder.schedule_type, reminder.interval_hours,
+                reminder.random_interval_hours, quiet, zone
             )
-            logger.info(f"Scheduled random reminder {reminder.id} for {next_run_time}")
+            now = time.time()
+            stored = reminder.next_fire_at
+            if stored is not None:
+                # После перезапуска продолжаем с сохранённого времени
+                fire_at = pytz.utc.localize(stored).timestamp()
+                target.add_timed(spec, fire_at, replace)
+            else:
+                set_next_fire(spec, next_fire_time(spec, now), target=target, replace=replace)
+            logger.debug(f"Scheduled {reminder.schedule_type} reminder {reminder.id}")
+        else:
+            target.remove(reminder.id)
     except Exception as e:
         logger.error(f"Failed to schedule reminder {reminder.id}: {e}")
 
 
-def generate_random_time(reminder):
-    """Генерирует случайное время для напоминания в пределах интервала"""
-    now = datetime.now(msk_tz)
+async def apply_changes(batch_size: int = 1000):
+    """Применяет к индексу новые записи журнала изменений: перечитывает только затронутые напоминания"""
+    global last_change_id
 
-    # Определяем интервал в секундах
-    interval_seconds = reminder.random_interval_hours * 3600
+    while True:
+        async with Session() as session:
+            changes = (await session.execute(
+                select(ReminderChange.id, ReminderChange.reminder_id, ReminderChange.kind)
+                .where(ReminderChange.id > last_change_id)
+                .order_by(ReminderChange.id)
+                .limit(batch_size)
+            )).all()
+            if not changes:
+                return
 
-    # Генерируем случайное смещение в пределах интервала
-    random_offset = random.randint(0, interval_seconds)
+            if any(kind == 'quotes' for _, _, kind in changes):
+                quote_pool.invalidate()
+            if any(reminder_id is None and kind is None for _, reminder_id, kind in changes):
+                # Запрошена полная перезагрузка
+                await load_reminders()
+                return
 
-    # Вычисляем следующее время выполнения
-    next_run_time = now + timedelta(seconds=random_offset)
+            reminder_ids = {reminder_id for _, reminder_id, kind in changes if kind is None}
+            reminders = (await session.execute(
+                schedule_query().where(UserReminder.id.in_(reminder_ids), UserReminder.is_active == True)
+            )).all() if reminder_ids else []
 
-    # Если установлено тихое время, проверяем не попадает ли в него
-    if reminder.start_time and reminder.end_time:
-        start_hour, start_minute = map(int, reminder.start_time.split(':'))
-        end_hour, end_minute = map(int, reminder.end_time.split(':'))
+        last_change_id = changes[-1][0]
+        reminders = [reminder for reminder in reminders if leases.owns(reminder.user_id)]
+        for reminder in reminders:
+            schedule_reminder(reminder)
+        # Удалённые, отключённые и чужие напоминания убираем из индекса
+        remove_reminders(reminder_ids - {reminder.id for reminder in reminders})
+        logger.info(f"Applied {len(changes)} reminder changes")
 
-        # Создаем временные объекты
-        quiet_start = time(start_hour, start_minute)
-        quiet_end = time(end_hour, end_minute)
+        if len(changes) < batch_size:
+            return
 
-        # Получаем время следующего выполнения
-        next_run_time_time = next_run_time.time()
 
-        # Проверяем, попадает ли в тихое время
-        if quiet_start < quiet_end:
-            # Тихое время не пересекает полночь
-            is_quiet_time = quiet_start <= next_run_time_time <= quiet_end
-        else:
-            # Тихое время пересекает полночь (например, 23:00-06:00)
-            is_quiet_time = next_run_time_time >= quiet_start or next_run_time_time <= quiet_end
-
-        # Если попадает в тихое время, корректируем
-        if is_quiet_time:
-            if quiet_start < quiet_end:
-                # Добавляем время до конца тихого периода
-                quiet_end_dt = datetime.combine(next_run_time.date(), quiet_end)
-                if next_run_time < quiet_end_dt:
-                    next_run_time = quiet_end_dt
-                else:
-                    next_run_time = quiet_end_dt + timedelta(days=1)
-            else:
-                # Тихое время пересекает полночь
-                if next_run_time_time >= quiet_start:
-                    # Текущее время после начала тихого времени
-                    quiet_end_dt = datetime.combine(next_run_time.date() + timedelta(days=1), quiet_end)
-                    next_run_time = quiet_end_dt
-                else:
-                    # Текущее время до окончания тихого времени
-                    quiet_end_dt = datetime.combine(next_run_time.date(), quiet_end)
-                    next_run_time = quiet_end_dt
+async def renew_leases() -> bool:
+    """Продлевает аренду шардов; True — набор шардов изменился"""
+    try:
+        async with Session() as session:
+            return await leases.renew(session)
+    except Exception as e:
+        logger.error(f"Failed to renew shard leases: {e}")
+        return False
 
-    return next_run_time
 
+async def prune_changes():
+    """Удаляет старые записи журнала: все процессы давно их применили"""
+    cutoff = datetime.utcnow() - timedelta(hours=REMINDER_CHANGES_RETENTION)
+    async with Session() as session:
+        await session.execute(delete(ReminderChange).where(ReminderChange.created_at < cutoff))
+        await session.commit()
+
+
+async def flush_next_fire():
+    """Сохраняет времена следующих запусков одним запросом"""
+    if not pending_next_fire:
+        return
+    batch = [{"id": reminder_id, "next_fire_at": fire_at} for reminder_id, fire_at in pending_next_fire.items()]
+    pending_next_fire.clear()
+    async with Session() as session:
+        await session.execute(update(UserReminder), batch)
+        await session.commit()
+
+
+async def tick(now: datetime = None):
+    """Минутный тик: собирает все напоминания, которым пора, и отправляет их.
+
+    now задаётся только при симуляции (benchmarks), по умолчанию — текущее время"""
+    global last_tick
 
-async def async_send_reminder(reminder_id):
-    """Асинхронная обертка для отправки напоминания"""
-    logger.info(f"Starting to send reminder {reminder_id}")
+    # Без действующей аренды не отправляем ничего: шард мог уже достаться другому воркеру
+    if await renew_leases():
+        await load_reminders()
+    if not leases.is_valid():
+        logger.warning("Shard leases expired, skipping tick")
+        dispatcher.clear()
+        leases.owned = frozenset()
+        return
+
+    # Подхватываем изменения, сделанные в боте с прошлого тика
     try:
-        await send_reminder(reminder_id)
+        await apply_changes()
     except Exception as e:
-        logger.error(f"Error in async_send_reminder for {reminder_id}: {e}")
+        logger.error(f"Failed to apply reminder changes: {e}")
+
+    # Пока собирается новый индекс, старый не трогаем: иначе перенесённые тиком запуски
+    # interval/random пропадут при подмене индекса и напоминания придут повторно
+    async with load_lock:
+        now_ts = time.time() if now is None else now.timestamp()
+        now = datetime.fromtimestamp(now_ts, pytz.utc).replace(second=0, microsecond=0)
+        # Пояс, у которого сменилось смещение, перекладываем целиком, остальные не трогаем
+        moved = dispatcher.refresh_offsets(now.timestamp())
+        if moved:
+            logger.info(f"Re-indexed {moved} reminders after a UTC offset change")
+
+        # Если тик опоздал, догоняем пропущенные минуты, но не дальше MISFIRE_GRACE_TIME
+        first = now if last_tick is None else max(last_tick + timedelta(minutes=1),
+                                                  now - timedelta(seconds=MISFIRE_GRACE_TIME))
+        last_tick = now
+
+        due = set()
+        minute = first
+        while minute <= now:
+            fixed = dispatcher.due_fixed(minute.hour * 60 + minute.minute)
+            if minute < now:
+                tick_stats['late'] += len(fixed)
+            due |= fixed
+            minute += timedelta(minutes=1)
+
+        for fire_at, spec in dispatcher.pop_due_timed(now_ts):
+            if fire_at < now_ts - MISFIRE_GRACE_TIME:
+                tick_stats['missed'] += 1
+            else:
+                due.add(spec.id)
+                if fire_at < now_ts - 60:
+                    tick_stats['late'] += 1
+            # Следующий запуск считаем сразу, пока напоминание не успели изменить
+            next_at = next_fire_time(spec, fire_at)
+            while next_at <= now_ts:
+                next_at = next_fire_time(spec, next_at)
+            set_next_fire(spec, next_at, known=True)
+
+        # Тихое время проверяем по заранее разобранным окнам в поясе пользователя, без загрузки из БД
+        due, quiet = dispatcher.split_quiet(due, now.hour * 60 + now.minute)
+        tick_stats['quiet'] += len(quiet)
+        if quiet:
+            reminder_stats.add_many(
+                {"reminder_id": reminder_id, "status": 'skipped_quiet_time'} for reminder_id in quiet
+            )
+            logger.info(f"Skipped {len(quiet)} reminders due to quiet time")
 
+        tick_stats['due'] += len(due)
+        if due:
+            task = asyncio.create_task(send_batch(due))
+            sending_tasks.add(task)
+            task.add_done_callback(sending_tasks.discard)
 
-async def send_reminder(reminder_id):
-    """Отправляет напоминание"""
-    try:
-        with Session() as session:
-            reminder = session.query(UserReminder).get(reminder_id)
-            if not reminder or not reminder.is_active:
-                logger.warning(f"Reminder {reminder_id} not found or inactive")
-                return
+        try:
+            await flush_next_fire()
+            if now.minute == 0:
+                await prune_changes()
+        except Exception as e:
+            logger.error(f"Failed to save scheduler state: {e}")
 
-            # Проверяем, не тихое ли сейчас время (только если установлено тихое время)
-            if reminder.start_time and reminder.end_time:
-                now = datetime.now(msk_tz)
-                current_time = now.time()
 
-                start = time(*map(int, reminder.start_time.split(':')))
-                end = time(*map(int, reminder.end_time.split(':')))
+def generate_random_time(spec: TimedSpec, now: datetime = None):
+    """Генерирует случайное время для напоминания в пределах интервала, отсчитывая от now"""
+    if now is None:
+        now = datetime.now(pytz.timezone(spec.zone))
 
-                # Логика для времени, которое переходит через полночь (23:00-06:00)
-                if start < end:
-                    # Обычный интервал в пределах одних суток
-                    is_quiet_time = start <= current_time <= end
-                else:
-                    # Интервал переходит через полночь (например, 23:00-06:00)
-                    is_quiet_time = current_time >= start or current_time <= end
-
-                if is_quiet_time:
-                    # Записываем в статистику пропуск из-за тихого времени
-                    stat = ReminderStat(
-                        reminder_id=reminder.id,
-                        status='skipped_quiet_time'
-                    )
-                    session.add(stat)
-                    session.commit()
-                    logger.info(f"Skipped reminder {reminder.id} due to quiet time")
-
-                    # Для случайных напоминаний планируем следующее
-                    if reminder.schedule_type == 'random':
-                        schedule_reminder(reminder)
-                    return
-
-            # Формируем сообщение
-            if reminder.type == 'habit':
-                if reminder.habit_type:
-                    # Предустановленная привычка
-                    habits = {
-                        "water": "💧 Не забудь выпить стакан воды!",
-                        "posture": "🧘 Проверь свою осанку!",
-                        "eyes": "👀 Сделай перерыв и зарядку для глаз",
-                        "stretch": "🔁 Пора размяться и потянуться!"
-                    }
-                    text = habits[reminder.habit_type]
-                else:
-                    text = f"🏃 Напоминание: {reminder.custom_text}"
-            else:
-                # Случайная цитата из всей базы
-                quote = session.query(Quote).filter_by(is_active=True).order_by(func.random()).first()
-                text = f"💬 {quote.text}" if quote else "💬 Помни, что ты молодец!"
+    # Генерируем случайное смещение в пределах интервала
+    next_run_time = now + timedelta(seconds=random.randint(0, spec.random_interval_hours * 3600))
 
-            # Отправляем сообщение
-            await bot.send_message(reminder.user_id, text)
+    # Если время попало в тихий период, переносим на его конец
+    minute_of_day = next_run_time.hour * 60 + next_run_time.minute
+    if in_quiet(minute_of_day, spec.quiet):
+        wait = (spec.quiet[1] - minute_of_day) % MINUTES_PER_DAY
+        next_run_time = next_run_time.replace(second=0, microsecond=0) + timedelta(minutes=wait)
 
-            # Записываем в статистику успешную отправку
-            stat = ReminderStat(
-                reminder_id=reminder.id,
-                status='sent'
-            )
-            session.add(stat)
-            session.commit()
+    return next_run_time
 
-            logger.info(f"Sent reminder {reminder.id} to user {reminder.user_id}")
 
-            # Для случайных напоминаний планируем следующее
-            if reminder.schedule_type == 'random':
-                schedule_reminder(reminder)
+HABITS = {
+    "water": "💧 Не забудь выпить стакан воды!",
+    "posture": "🧘 Проверь свою осанку!",
+    "eyes": "👀 Сделай перерыв и зарядку для глаз",
+    "stretch": "🔁 Пора размяться и потянуться!"
+}
+
+
+def reminder_text(reminder) -> str:
+    """Формирует текст напоминания"""
+    if reminder.type == 'habit':
+        if reminder.habit_type:
+            # Предустановленная привычка
+            return HABITS[reminder.habit_type]
+        return f"🏃 Напоминание: {reminder.custom_text}"
+    # Случайная цитата из всей базы (из пула в памяти)
+    quote = quote_pool.choice(reminder.user_id)
+    return f"💬 {quote}" if quote else "💬 Помни, что ты молодец!"
+
+
+async def deliver_reminder(reminder, text, bucket: TokenBucket, limit: asyncio.Semaphore) -> str:
+    """Отправляет одно напоминание, возвращает статус для статистики"""
+    async with limit:
+        for _ in range(REMINDER_MAX_RETRIES):
+            await bucket.acquire()
+            try:
+                await bot.send_message(reminder.user_id, text)
+                return 'sent'
+            except TelegramRetryAfter as e:
+                logger.warning(f"Reminders: flood control, pausing for {e.retry_after}s")
+                bucket.pause(e.retry_after)
+            except Exception as e:
+                if is_permanent_error(e):
+                    logger.info(f"User {reminder.user_id} is unreachable ({e})")
+                    return 'blocked'
+                logger.error(f"Failed to send reminder {reminder.id}: {e}")
+                return 'error'
+    return 'error'
+
+
+async def send_batch(reminder_ids):
+    """Отправляет пачку напоминаний: один запрос на загрузку, одна вставка статистики"""
+    reminder_ids = list(reminder_ids)
+    logger.info(f"Dispatching {len(reminder_ids)} reminders")
+    stats = []
+    blocked_users = set()
+    try:
+        for start in range(0, len(reminder_ids), REMINDER_BATCH_SIZE):
+            chunk = reminder_ids[start:start + REMINDER_BATCH_SIZE]
+            async with Session() as session:
+                rows = (await session.execute(
+                    select(UserReminder, User.is_blocked)
+                    .outerjoin(User, User.user_id == UserReminder.user_id)
+                    .where(UserReminder.id.in_(chunk), UserReminder.is_active == True)
+                )).all()
+                if any(reminder.type != 'habit' for reminder, _ in rows):
+                    await quote_pool.ensure(session)
+
+            sends = []
+            for reminder, user_blocked in rows:
+                if user_blocked:
+                    # Пользователь заблокировал бота: напоминание больше не отправляем
+                    blocked_users.add(reminder.user_id)
+                else:
+                    sends.append(reminder)
+
+            statuses = await asyncio.gather(*(
+                deliver_reminder(reminder, reminder_text(reminder), reminder_bucket, reminder_limit)
+                for reminder in sends
+            ))
+            for reminder, status in zip(sends, statuses):
+                stats.append({"reminder_id": reminder.id, "status": status})
+                if status == 'blocked':
+                    blocked_users.add(reminder.user_id)
+    except Exception as e:
+        logger.error(f"Failed to send reminder batch: {e}")
+    finally:
+        # Статистику сохраняем даже при сбое, чтобы она не расходилась с отправленным
+        await asyncio.shield(save_batch_results(stats, blocked_users))
+
+    counts = Counter(stat["status"] for stat in stats)
+    logger.info(f"Reminder batch done: {dict(counts)}")
+
 
+async def save_batch_results(stats, blocked_users):
+    """Отдаёт статистику в буфер и отключает напоминания недоступных пользователей"""
+    reminder_stats.add_many(stats)
+    if not blocked_users:
+        return
+    try:
+        async with Session() as session:
+            reminder_ids = await mark_unreachable(session, blocked_users)
+            await session.commit()
+        remove_reminders(reminder_ids)
     except Exception as e:
-        logger.error(f"Failed to send reminder {reminder_id}: {e}")
+        logger.error(f"Failed to disable reminders of unreachable users: {e}")
 
-        # Записываем в статистику ошибку
-        try:
-            with Session() as session:
-                stat = ReminderStat(
-                    reminder_id=reminder_id,
-                    status='error'
-                )
-                session.add(stat)
-                session.commit()
-        except Exception as inner_e:
-            logger.error(f"Failed to save error stat: {inner_e}")
 
+async def send_reminder(reminder_id):
+    """Отправляет одно напоминание (например, тестовое) через общий пакетный путь"""
+    await send_batch([reminder_id])
 
-def remove_reminder(reminder_id):
-    """Удаляет все job'ы для этого напоминания"""
+
+async def shutdown_scheduler():
+    """Останавливает тик, дожидается начатых отправок и сохраняет всё, что накоплено в памяти"""
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    if sending_tasks:
+        await asyncio.gather(*sending_tasks, return_exceptions=True)
+    try:
+        await flush_next_fire()
+    except Exception as e:
+        logger.error(f"Failed to save next fire times: {e}")
+    try:
+        await reminder_stats.close()
+    except Exception as e:
+        logger.error(f"Failed to flush reminder stats: {e}")
     try:
-        jobs = scheduler.get_jobs()
-        for job in jobs:
-            if job.id.startswith(f"reminder_{reminder_id}"):
-                scheduler.remove_job(job.id)
-                logger.info(f"Removed job {job.id} for reminder {reminder_id}")
+        async with Session() as session:
+            await leases.release(session)
     except Exception as e:
-        logger.error(f"Failed to remove reminder {reminder_id}: {e}")
+        logger.error(f"Failed to release shard leases: {e}")
 
 
-# Инициализируем планировщик при импорте модуля
-init_scheduler()
\ No newline at end of file
+def remove_reminder(reminder_id):
+    """Убирает напоминание из индекса диспетчера"""
+    remove_reminders([reminder_id])
+
+
+def remove_reminders(reminder_ids):
+    """Убирает пачку напоминаний: стоимость зависит только от их числа, а не от размера индекса"""
+    reminder_ids = list(reminder_ids)
+    try:
+        dispatcher.remove_many(reminder_ids)
+        for reminder_id in reminder_ids:
+            pending_next_fire.pop(reminder_id, None)
+        logger.info(f"Removed {len(reminder_ids)} reminders from dispatcher")
+    except Exception as e:
+        logger.error(f"Failed to remove reminders {reminder_ids[:10]}: {e}")
\ No newline at end of file
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+import logging
+
+from sqlalchemy import select, update, insert, delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import ShardLease, ReminderWorker
+
+logger = logging.getLogger(__name__)
+
+
+class ShardLeases:
+    """Аренда шардов напоминаний: каждый воркер обслуживает только пользователей своих шардов.
+
+    Шард пользователя — user_id % shards. Аренда продлевается каждым тиком; если воркер
+    пропал, его аренда истекает через ttl секунд и шард забирает другой воркер.
+    Аренда всегда заканчивается на границе минуты: прежний владелец обслуживает шард
+    до конца последней своей минуты, новый забирает его с начала следующей, так что
+    ни одна минута не теряется и не отправляется дважды.
+    """
+
+    def __init__(self, shards: int, owner: str, ttl: int):
+        self.shards = shards
+        self.owner = owner
+        self.ttl = ttl
+        self.owned = frozenset()
+        # До какого момента (UTC) аренда точно наша, даже если продлить её не удалось
+        self.valid_until = datetime.min
+        # С какого момента отданные шарды уже не наши (None — ничего не отдаём)
+        self.handover_at = None
+
+    def shard_of(self, user_id: int) -> int:
+        return user_id % self.shards
+
+    def owns(self, user_id: int) -> bool:
+        return self.shard_of(user_id) in self.owned
+
+    def is_valid(self) -> bool:
+        now = datetime.utcnow()
+        return now < self.valid_until and (self.handover_at is None or now < self.handover_at)
+
+    async def renew(self, session: AsyncSession) -> bool:
+        """Продлевает свои шарды, забирает свободные до справедливой доли и отдаёт лишние.
+
+        Возвращает True, если набор шардов изменился. Коммит делает сам."""
+        now = datetime.utcnow()
+        expires_at = self._next_minute(now + timedelta(seconds=self.ttl))
+
+        # Отмечаемся среди живых воркеров, даже если шардов у нас пока нет
+        result = await session.execute(
+            update(ReminderWorker).filter_by(owner=self.owner).values(seen_at=now)
+        )
+        if result.rowcount == 0:
+            session.add(ReminderWorker(owner=self.owner, seen_at=now))
+        alive = set((await session.scalars(
+            select(ReminderWorker.owner).where(ReminderWorker.seen_at > now - timedelta(seconds=self.ttl))
+        )).all()) | {self.owner}
+        # Справедливая доля: поровну, остаток — первым по имени, чтобы доли в сумме давали все шарды
+        base, rest = divmod(self.shards, len(alive))
+        target = base + (1 if sorted(alive).index(self.owner) < rest else 0)
+
+        # Строки аренды создаются один раз на каждый шард
+        existing = set((await session.scalars(select(ShardLease.shard))).all())
+        missing = [{"shard": shard, "owner": None, "expires_at": now}
+                   for shard in range(self.shards) if shard not in existing]
+        if missing:
+            await session.execute(insert(ShardLease), missing)
+
+        leases = (await session.execute(
+            select(ShardLease.shard, ShardLease.owner, ShardLease.expires_at).where(ShardLease.shard < self.shards)
+        )).all()
+        mine = sorted(shard for shard, owner, until in leases if owner == self.owner and until > now)
+
+        # Появились новые воркеры: продлеваем только справедливую долю, лишнее отдаём со следующей
+        # минуты. Текущую минуту по этим шардам ещё обслуживаем сами — новый владелец заберёт их
+        # только на следующем тике
+        keep, extra = set(mine[:target]), mine[target:]
+        if keep:
+            await session.execute(
+                update(ShardLease)
+                .where(ShardLease.shard.in_(keep), ShardLease.owner == self.owner)
+                .values(expires_at=expires_at)
+            )
+        if extra:
+            await session.execute(
+                update(ShardLease)
+                .where(ShardLease.shard.in_(extra), ShardLease.owner == self.owner)
+                .values(expires_at=self._next_minute(now))
+            )
+            logger.info(f"Worker {self.owner} hands over shards {extra} from the next minute")
+
+        # Забираем свободные и просроченные шарды
+        for shard, owner, until in leases:
+            if len(keep) >= target:
+                break
+            if shard in keep or (owner and until > now):
+                continue
+            result = await session.execute(
+                update(ShardLease)
+                .where(ShardLease.shard == shard, or_(ShardLease.owner == None, ShardLease.expires_at <= now))
+                .values(owner=self.owner, expires_at=expires_at)
+            )
+            if result.rowcount == 1:
+                keep.add(shard)
+
+        await session.commit()
+        self.valid_until = expires_at
+        # Отдаваемые шарды действуют только до конца минуты: если следующее продление не удастся,
+        # is_valid() остановит отправку, а не даст обслуживать их вместе с новым владельцем
+        self.handover_at = self._next_minute(now) if extra else None
+        owned = keep | set(extra)
+        changed = owned != self.owned
+        if changed:
+            logger.info(f"Worker {self.owner} now owns shards {sorted(owned)} of {self.shards}")
+        self.owned = frozenset(owned)
+        return changed
+
+    async def release(self, session: AsyncSession):
+        """Отдаёт все свои шарды (при остановке воркера)"""
+        await session.execute(delete(ReminderWorker).filter_by(owner=self.owner))
+        await session.execute(
+            update(ShardLease)
+            .where(ShardLease.shard.in_(self.owned), ShardLease.owner == self.owner)
+            .values(expires_at=self._next_minute(datetime.utcnow()))
+        )
+        await session.commit()
+        self.owned = frozenset()
+        self.valid_until = datetime.min
+        self.handover_at = None
+
+    @staticmethod
+    def _next_minute(now: datetime) -> datetime:
+        return now.replace(second=0, microsecond=0) + timedelta(minutes=1)
\ No newline at end of file
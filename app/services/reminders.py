@@ -7,10 +7,12 @@ from datetime import datetime, time
 import json
 import random
 
-from app.db.session import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import UserReminder, Quote, ReminderStat
 from app.keyboards import get_main_menu
 from app.utils.roles import get_user_role
+from app.utils.reminder_log import log_reminder_changes
 
 router = Router()
 
@@ -130,7 +132,7 @@ async def process_schedule_type(message: Message, state: FSMContext):
     if message.text == "🕐 В определённое время":
         schedule_type = "fixed"
         await state.update_data(schedule_type=schedule_type)
-        await message.answer("Введи время отправки через запятую (например: 09:00, 13:00, 18:00)")
+        await message.answer("Введи время отправки по твоему местному времени через запятую (например: 09:00, 13:00, 18:00)")
         await state.set_state(ReminderStates.setting_fixed_times)
     elif message.text == "🔄 С интервалом":
         schedule_type = "interval"
@@ -201,8 +203,8 @@ async def set_quiet_time(message: Message, state: FSMContext):
 
 
 @router.message(ReminderStates.setting_quiet_time, F.text == "✅ Оставить по умолчанию (23:00-06:00)")
-async def process_default_quiet_time(message: Message, state: FSMContext):
-    await save_reminder(message, state, "23:00", "06:00")
+async def process_default_quiet_time(message: Message, state: FSMContext, session: AsyncSession):
+    await save_reminder(message, state, session, "23:00", "06:00")
 
 
 @router.message(ReminderStates.setting_quiet_time, F.text == "✏️ Настроить своё время")
@@ -211,12 +213,12 @@ async def custom_quiet_time(message: Message, state: FSMContext):
 
 
 @router.message(ReminderStates.setting_quiet_time, F.text == "❌ Без тихого времени")
-async def no_quiet_time(message: Message, state: FSMContext):
-    await save_reminder(message, state, None, None)
+async def no_quiet_time(message: Message, state: FSMContext, session: AsyncSession):
+    await save_reminder(message, state, session, None, None)
 
 
 @router.message(ReminderStates.setting_quiet_time)
-async def process_custom_quiet_time(message: Message, state: FSMContext):
+async def process_custom_quiet_time(message: Message, state: FSMContext, session: AsyncSession):
     if "-" not in message.text:
         return await message.answer("Используй формат 'начало-конец' (например: 23:00-07:00)")
 
@@ -224,105 +226,101 @@ async def process_custom_quiet_time(message: Message, state: FSMContext):
         start, end = message.text.split("-", 1)
         datetime.strptime(start.strip(), "%H:%M")
         datetime.strptime(end.strip(), "%H:%M")
-        await save_reminder(message, state, start.strip(), end.strip())
+        await save_reminder(message, state, session, start.strip(), end.strip())
     except ValueError:
         await message.answer("Неверный формат времени. Используй ЧЧ:ММ")
 
 
-async def save_reminder(message: Message, state: FSMContext, quiet_start: str, quiet_end: str):
+async def save_reminder(message: Message, state: FSMContext, session: AsyncSession, quiet_start: str, quiet_end: str):
     data = await state.get_data()
 
-    with Session() as session:
-        reminder = UserReminder(
-            user_id=message.from_user.id,
-            type=data['type'],
-            habit_type=data.get('habit_type'),
-            custom_text=data.get('custom_text'),
-            schedule_type=data['schedule_type'],
-            times=data.get('times'),
-            interval_hours=data.get('interval_hours'),
-            random_interval_hours=data.get('random_interval_hours'),
-            start_time=quiet_start,
-            end_time=quiet_end
-        )
-        session.add(reminder)
-        session.commit()
-
-        # Немедленно планируем напоминание
-        from app.services.reminder_service import schedule_reminder
-        schedule_reminder(reminder)
+    reminder = UserReminder(
+        user_id=message.from_user.id,
+        type=data['type'],
+        habit_type=data.get('habit_type'),
+        custom_text=data.get('custom_text'),
+        schedule_type=data['schedule_type'],
+        times=data.get('times'),
+        interval_hours=data.get('interval_hours'),
+        random_interval_hours=data.get('random_interval_hours'),
+        start_time=quiet_start,
+        end_time=quiet_end
+    )
+    session.add(reminder)
+    await session.flush()
+    # Диспетчер подхватит напоминание из журнала перед ближайшим тиком
+    log_reminder_changes(session, [reminder.id])
+    await session.commit()
 
-    await message.answer("✅ Напоминание добавлено!", reply_markup=get_main_menu(get_user_role(message.from_user.id)))
+    await message.answer("✅ Напоминание добавлено!", reply_markup=get_main_menu(await get_user_role(session, message.from_user.id)))
     await state.clear()
 
 
 @router.message(F.text == "📋 Мои напоминания")
-async def list_reminders(message: Message):
-    with Session() as session:
-        reminders = session.query(UserReminder).filter_by(
-            user_id=message.from_user.id,
-            is_active=True
-        ).all()
-
-        if not reminders:
-            return await message.answer("У тебя пока нет активных напоминаний")
-
-        text = "📋 Твои напоминания:\n\n"
-        for i, rem in enumerate(reminders, 1):
-            if rem.type == 'habit':
-                if rem.habit_type:
-                    habit_text = PREDEFINED_HABITS[rem.habit_type]
-                else:
-                    habit_text = rem.custom_text
-                text += f"{i}. 🏃 {habit_text}\n"
+async def list_reminders(message: Message, session: AsyncSession):
+    reminders = (await session.scalars(select(UserReminder).filter_by(
+        user_id=message.from_user.id,
+        is_active=True
+    ))).all()
+
+    if not reminders:
+        return await message.answer("У тебя пока нет активных напоминаний")
+
+    text = "📋 Твои напоминания:\n\n"
+    for i, rem in enumerate(reminders, 1):
+        if rem.type == 'habit':
+            if rem.habit_type:
+                habit_text = PREDEFINED_HABITS[rem.habit_type]
             else:
-                text += f"{i}. 💬 Мотивационная цитата\n"
+                habit_text = rem.custom_text
+            text += f"{i}. 🏃 {habit_text}\n"
+        else:
+            text += f"{i}. 💬 Мотивационная цитата\n"
 
-            if rem.schedule_type == 'fixed':
-                times = json.loads(rem.times)
-                text += f"   🕐 Время: {', '.join(times)}\n"
-            elif rem.schedule_type == 'interval':
-                text += f"   🔄 Каждые {rem.interval_hours} ч.\n"
-            else:
-                text += f"   🎲 Случайно каждые {rem.random_interval_hours} ч.\n"
+        if rem.schedule_type == 'fixed':
+            times = json.loads(rem.times)
+            text += f"   🕐 Время: {', '.join(times)}\n"
+        elif rem.schedule_type == 'interval':
+            text += f"   🔄 Каждые {rem.interval_hours} ч.\n"
+        else:
+            text += f"   🎲 Случайно каждые {rem.random_interval_hours} ч.\n"
 
-            if rem.start_time and rem.end_time:
-                text += f"   🤫 Тихие часы: {rem.start_time}-{rem.end_time}\n\n"
-            else:
-                text += f"   🤫 Тихие часы: нет\n\n"
+        if rem.start_time and rem.end_time:
+            text += f"   🤫 Тихие часы: {rem.start_time}-{rem.end_time}\n\n"
+        else:
+            text += f"   🤫 Тихие часы: нет\n\n"
 
-        await message.answer(text)
+    await message.answer(text)
 
 
 @router.message(F.text == "🗑️ Удалить напоминания")
-async def delete_reminders(message: Message, state: FSMContext):
-    with Session() as session:
-        reminders = session.query(UserReminder).filter_by(
-            user_id=message.from_user.id,
-            is_active=True
-        ).all()
-
-        if not reminders:
-            return await message.answer("У тебя пока нет активных напоминаний")
-
-        text = "🗑️ Выбери номер напоминания для удаления:\n\n"
-        for i, rem in enumerate(reminders, 1):
-            if rem.type == 'habit':
-                if rem.habit_type:
-                    habit_text = PREDEFINED_HABITS[rem.habit_type]
-                else:
-                    habit_text = rem.custom_text
-                text += f"{i}. 🏃 {habit_text}\n"
+async def delete_reminders(message: Message, state: FSMContext, session: AsyncSession):
+    reminders = (await session.scalars(select(UserReminder).filter_by(
+        user_id=message.from_user.id,
+        is_active=True
+    ))).all()
+
+    if not reminders:
+        return await message.answer("У тебя пока нет активных напоминаний")
+
+    text = "🗑️ Выбери номер напоминания для удаления:\n\n"
+    for i, rem in enumerate(reminders, 1):
+        if rem.type == 'habit':
+            if rem.habit_type:
+                habit_text = PREDEFINED_HABITS[rem.habit_type]
             else:
-                text += f"{i}. 💬 Мотивационная цитата\n"
+                habit_text = rem.custom_text
+            text += f"{i}. 🏃 {habit_text}\n"
+        else:
+            text += f"{i}. 💬 Мотивационная цитата\n"
 
-        await message.answer(text)
-        await state.set_state(ReminderStates.deleting_reminder)
-        await state.update_data(reminders=[r.id for r in reminders])
+    await message.answer(text)
+    await state.set_state(ReminderStates.deleting_reminder)
+    await state.update_data(reminders=[r.id for r in reminders])
 
 
 @router.message(ReminderStates.deleting_reminder)
-async def process_delete_reminder(message: Message, state: FSMContext):
+async def process_delete_reminder(message: Message, state: FSMContext, session: AsyncSession):
     try:
         number = int(message.text.strip())
         data = await state.get_data()
@@ -334,18 +332,15 @@ async def process_delete_reminder(message: Message, state: FSMContext):
 
         reminder_id = reminders[number - 1]
 
-        with Session() as session:
-            reminder = session.query(UserReminder).get(reminder_id)
-            if reminder and reminder.user_id == message.from_user.id:
-                # Удаляем из планировщика
-                from app.services.reminder_service import remove_reminder
-                remove_reminder(reminder_id)
-
-                session.delete(reminder)
-                session.commit()
-                await message.answer("✅ Напоминание удалено!")
-            else:
-                await message.answer("Не удалось найти напоминание.")
+        reminder = await session.get(UserReminder, reminder_id)
+        if reminder and reminder.user_id == message.from_user.id:
+            # Диспетчер уберёт напоминание по журналу изменений
+            await session.delete(reminder)
+            log_reminder_changes(session, [reminder_id])
+            await session.commit()
+            await message.answer("✅ Напоминание удалено!")
+        else:
+            await message.answer("Не удалось найти напоминание.")
 
         await state.clear()
     except ValueError:
@@ -353,34 +348,33 @@ async def process_delete_reminder(message: Message, state: FSMContext):
 
 
 @router.message(F.text == "⬅️ Назад")
-async def back_from_reminders(message: Message, state: FSMContext):
+async def back_from_reminders(message: Message, state: FSMContext, session: AsyncSession):
     await state.clear()
-    role = get_user_role(message.from_user.id)
+    role = await get_user_role(session, message.from_user.id)
     await message.answer("Главное меню:", reply_markup=get_main_menu(role))
 
 
 @router.message(F.text == "/test_reminder")
-async def test_reminder(message: Message):
+async def test_reminder(message: Message, session: AsyncSession):
     """Тестовая команда для проверки работы напоминаний"""
     try:
         from app.services.reminder_service import send_reminder
 
         # Создаем тестовое напоминание
-        with Session() as session:
-            reminder = UserReminder(
-                user_id=message.from_user.id,
-                type='habit',
-                habit_type='water',
-                schedule_type='fixed',
-                times=json.dumps(["00:01"]),
-                start_time=None,
-                end_time=None
-            )
-            session.add(reminder)
-            session.commit()
-
-            # Немедленно отправляем напоминание
-            await send_reminder(reminder.id)
+        reminder = UserReminder(
+            user_id=message.from_user.id,
+            type='habit',
+            habit_type='water',
+            schedule_type='fixed',
+            times=json.dumps(["00:01"]),
+            start_time=None,
+            end_time=None
+        )
+        session.add(reminder)
+        await session.commit()
+
+        # Немедленно отправляем напоминание
+        await send_reminder(reminder.id)
 
         await message.answer("Тестовое напоминание отправлено!")
     except Exception as e:
@@ -388,11 +382,18 @@ async def test_reminder(message: Message):
 
 
 @router.message(F.text == "/reload_reminders")
-async def reload_reminders(message: Message):
-    """Перезагружает все напоминания в планировщике"""
+async def reload_reminders(message: Message, session: AsyncSession):
+    """Перестраивает индекс диспетчера напоминаний по БД"""
     try:
-        from app.services.reminder_service import load_reminders
-        load_reminders()
-        await message.answer("✅ Напоминания перезагружены!")
+        log_reminder_changes(session)
+        await session.commit()
+
+        # Если диспетчер работает в этом процессе, перезагружаем сразу, иначе это сделает воркер
+        from app.services.reminder_service import scheduler, load_reminders
+        if not scheduler.running:
+            return await message.answer("✅ Воркер напоминаний перезагрузит их перед ближайшим тиком.")
+
+        loaded, elapsed = await load_reminders()
+        await message.answer(f"✅ Напоминания перезагружены: {loaded} за {elapsed:.2f} с")
     except Exception as e:
         await message.answer(f"❌ Ошибка при перезагрузке: {e}")
\ No newline at end of file
@@ -2,10 +2,12 @@ from aiogram import Router, F
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import Session
 from app.db.models import Quote
+from app.utils.quotes import quote_pool
+from app.utils.reminder_log import log_quote_change
 from app.utils.roles import get_user_role
 
 router = Router()
@@ -17,8 +19,8 @@ class QuoteStates(StatesGroup):
 
 
 @router.message(F.text == "✏️ Управление цитатами")
-async def manage_quotes(message: Message):
-    role = get_user_role(message.from_user.id)
+async def manage_quotes(message: Message, session: AsyncSession):
+    role = await get_user_role(session, message.from_user.id)
     if role < 1:
         return await message.answer("⛔ У тебя нет доступа.")
 
@@ -41,60 +43,60 @@ async def add_quote(message: Message, state: FSMContext):
 
 
 @router.message(QuoteStates.waiting_text)
-async def add_quote_text(message: Message, state: FSMContext):
+async def add_quote_text(message: Message, state: FSMContext, session: AsyncSession):
     if len(message.text) > 500:
         return await message.answer("Слишком длинная цитата. Максимум 500 символов.")
 
     await state.update_data(text=message.text)
 
     # Пропускаем выбор категории, сразу сохраняем цитату
-    with Session() as session:
-        quote = Quote(
-            text=message.text,
-            category="общие"  # Устанавливаем общую категорию по умолчанию
-        )
-        session.add(quote)
-        session.commit()
+    quote = Quote(
+        text=message.text,
+        category="общие"  # Устанавливаем общую категорию по умолчанию
+    )
+    session.add(quote)
+    # Отдельный воркер напоминаний узнает о новой цитате из журнала изменений
+    log_quote_change(session)
+    await session.commit()
+    await quote_pool.refresh(session)
 
     await message.answer("✅ Цитата добавлена!")
     await state.clear()
 
 
 @router.message(F.text == "📋 Список цитат")
-async def list_quotes(message: Message):
-    with Session() as session:
-        quotes = session.query(Quote).all()
+async def list_quotes(message: Message, session: AsyncSession):
+    quotes = (await session.scalars(select(Quote))).all()
 
-        if not quotes:
-            return await message.answer("Цитат пока нет.")
+    if not quotes:
+        return await message.answer("Цитат пока нет.")
 
-        text = "📋 Список цитат:\n\n"
-        for i, quote in enumerate(quotes, 1):
-            text += f"{i}. {quote.text[:50]}...\n"
+    text = "📋 Список цитат:\n\n"
+    for i, quote in enumerate(quotes, 1):
+        text += f"{i}. {quote.text[:50]}...\n"
 
-        await message.answer(text)
+    await message.answer(text)
 
 
 @router.message(F.text == "📊 Статистика цитат")
-async def quote_stats(message: Message):
-    with Session() as session:
-        total = session.query(Quote).count()
-        await message.answer(f"📊 Всего цитат в базе: {total}")
+async def quote_stats(message: Message, session: AsyncSession):
+    total = await session.scalar(select(func.count()).select_from(Quote))
+    await message.answer(f"📊 Всего цитат в базе: {total}")
 
 
 @router.message(F.text == "⬅️ Назад в админку")
-async def back_to_admin(message: Message, state: FSMContext):
+async def back_to_admin(message: Message, state: FSMContext, session: AsyncSession):
     await state.clear()
     from app.handlers.admin import admin_panel
-    await admin_panel(message)
+    await admin_panel(message, session)
 
 
 # Добавляем обработчики команд
 @router.message(F.text == "/list_quotes")
-async def list_quotes_command(message: Message):
-    await list_quotes(message)
+async def list_quotes_command(message: Message, session: AsyncSession):
+    await list_quotes(message, session)
 
 
 @router.message(F.text == "/quote_stats")
-async def quote_stats_command(message: Message):
-    await quote_stats(message)
\ No newline at end of file
+async def quote_stats_command(message: Message, session: AsyncSession):
+    await quote_stats(message, session)
\ No newline at end of file
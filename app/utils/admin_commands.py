@@ -11,7 +11,8 @@ ADMIN_COMMANDS = {
     "/add_quote": "Добавить цитату (пошагово)",
     "/list_quotes": "Показать список цитат",
     "/quote_stats": "Статистика цитат",
-    "/broadcast": "Сделать рассылку всем пользователям"
+    "/broadcast": "Сделать рассылку всем пользователям",
+    "/metrics": "Метрики бота и базы данных"
 }
 
 SUPERADMIN_COMMANDS = {
@@ -0,0 +1,55 @@
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import User
+from app.config import OWNER_ID, ADMIN_REFRESH_INTERVAL
+
+
+class AdminRegistry:
+    """Список админов хранится в БД (users.role >= 1), а в памяти держится его снимок.
+
+    Снимок перечитывается сразу после изменений в этом процессе и не реже чем раз
+    в ADMIN_REFRESH_INTERVAL секунд, так что несколько воркеров видят один и тот же список.
+    """
+
+    def __init__(self, refresh_interval: int):
+        self.refresh_interval = refresh_interval
+        self._ids = frozenset({OWNER_ID})
+        self._loaded_at = None
+
+    @property
+    def ids(self) -> frozenset:
+        """Последний загруженный снимок без обращения к БД"""
+        return self._ids
+
+    async def refresh(self, session: AsyncSession) -> frozenset:
+        admin_ids = (await session.scalars(select(User.user_id).where(User.role >= 1))).all()
+        self._ids = frozenset(admin_ids) | {OWNER_ID}
+        self._loaded_at = time.monotonic()
+        return self._ids
+
+    async def get(self, session: AsyncSession) -> frozenset:
+        """Снимок админов, перечитанный из БД, если он устарел"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            return await self.refresh(session)
+        return self._ids
+
+    async def seed(self, session: AsyncSession, admin_ids):
+        """Заполняет реестр начальным списком из конфига, если в БД ещё нет ни одного админа"""
+        if await session.scalar(select(User.id).where(User.role >= 1).limit(1)):
+            return await self.refresh(session)
+
+        for admin_id in admin_ids:
+            role = 2 if admin_id == OWNER_ID else 1
+            user = await session.scalar(select(User).filter_by(user_id=admin_id))
+            if user:
+                user.role = max(user.role, role)
+            else:
+                session.add(User(user_id=admin_id, role=role))
+        await session.commit()
+        return await self.refresh(session)
+
+
+admin_registry = AdminRegistry(ADMIN_REFRESH_INTERVAL)
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import User, UserReminder
+from app.utils.reminder_log import log_reminder_changes
+
+# Ошибки Telegram, после которых писать пользователю бессмысленно
+PERMANENT_ERRORS = ("chat not found", "user is deactivated", "bot was blocked", "bot can't initiate")
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Пользователь заблокировал бота, удалил аккаунт или чат не существует"""
+    if isinstance(error, TelegramForbiddenError):
+        return True
+    if isinstance(error, TelegramBadRequest):
+        return any(text in error.message.lower() for text in PERMANENT_ERRORS)
+    return False
+
+
+async def mark_unreachable(session: AsyncSession, user_ids) -> list:
+    """Помечает пользователей недоступными и отключает их напоминания.
+
+    Возвращает id отключённых напоминаний; диспетчер уберёт их по журналу изменений.
+    Коммит остаётся за вызывающим кодом."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+
+    await session.execute(
+        update(User)
+        .where(User.user_id.in_(user_ids), User.is_blocked == False)
+        .values(is_blocked=True, blocked_at=datetime.utcnow())
+    )
+    reminder_ids = (await session.scalars(
+        select(UserReminder.id).where(UserReminder.user_id.in_(user_ids), UserReminder.is_active == True)
+    )).all()
+    if reminder_ids:
+        await session.execute(
+            update(UserReminder).where(UserReminder.id.in_(reminder_ids)).values(is_active=False)
+        )
+        log_reminder_changes(session, reminder_ids)
+    return reminder_ids
@@ -0,0 +1,72 @@
+import random
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Quote
+from app.config import QUOTE_REFRESH_INTERVAL, QUOTE_NO_REPEAT, QUOTE_BAGS_SIZE
+
+
+class QuotePool:
+    """Активные цитаты в памяти: случайная цитата выбирается за O(1) без запроса к БД.
+
+    Пул перечитывается после изменения цитат (в другом процессе — по журналу изменений)
+    и не реже чем раз в QUOTE_REFRESH_INTERVAL секунд. С no_repeat каждому пользователю
+    цитаты выдаются из перемешанного «мешка» и не повторяются, пока мешок не опустеет;
+    мешки хранятся для bags_size последних пользователей.
+    """
+
+    def __init__(self, refresh_interval: int, no_repeat: bool = False, bags_size: int = QUOTE_BAGS_SIZE):
+        self.refresh_interval = refresh_interval
+        self.no_repeat = no_repeat
+        self.bags_size = bags_size
+        self._ids = []
+        self._texts = {}  # quote_id -> текст
+        self._bags = OrderedDict()  # user_id -> оставшиеся id цитат
+        self._loaded_at = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    async def refresh(self, session: AsyncSession):
+        rows = (await session.execute(select(Quote.id, Quote.text).filter_by(is_active=True))).all()
+        self._ids = [quote_id for quote_id, _ in rows]
+        self._texts = dict(rows)
+        self._loaded_at = time.monotonic()
+
+    async def ensure(self, session: AsyncSession):
+        """Перечитывает пул, если он ещё не загружен или устарел"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            await self.refresh(session)
+
+    def invalidate(self):
+        """Цитаты изменились: пул перечитается при следующем ensure"""
+        self._loaded_at = None
+
+    def choice(self, user_id: int = None):
+        """Текст случайной цитаты или None, если цитат нет"""
+        if not self._ids:
+            return None
+        if not self.no_repeat or user_id is None:
+            return self._texts[random.choice(self._ids)]
+
+        bag = self._bags.get(user_id)
+        if bag is not None:
+            self._bags.move_to_end(user_id)
+        while True:
+            if not bag:
+                bag = self._ids[:]
+                random.shuffle(bag)
+                self._bags[user_id] = bag
+                self._bags.move_to_end(user_id)
+                while len(self._bags) > self.bags_size:
+                    self._bags.popitem(last=False)
+            text = self._texts.get(bag.pop())
+            # Цитату могли отключить после того, как мешок был собран
+            if text is not None:
+                return text
+
+
+quote_pool = QuotePool(QUOTE_REFRESH_INTERVAL, QUOTE_NO_REPEAT)
\ No newline at end of file
@@ -0,0 +1,19 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import ReminderChange
+
+
+def log_reminder_changes(session: AsyncSession, reminder_ids=None):
+    """Пишет в журнал, что напоминания изменились; диспетчер перечитает их перед ближайшим тиком.
+
+    reminder_ids=None — перечитать все напоминания. Коммит остаётся за вызывающим кодом,
+    поэтому запись в журнал попадает в ту же транзакцию, что и само изменение."""
+    if reminder_ids is None:
+        session.add(ReminderChange(reminder_id=None))
+        return
+    session.add_all([ReminderChange(reminder_id=reminder_id) for reminder_id in reminder_ids])
+
+
+def log_quote_change(session: AsyncSession):
+    """Пишет в журнал, что изменились цитаты: процесс с диспетчером перечитает пул перед ближайшим тиком"""
+    session.add(ReminderChange(kind='quotes'))
\ No newline at end of file
@@ -1,15 +1,66 @@
-from app.db.session import Session
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.db.models import User
-from app.config import OWNER_ID, ADMIN_IDS
+from app.config import OWNER_ID, ROLE_CACHE_TTL, ROLE_CACHE_SIZE
+from app.utils.admins import admin_registry
+
+
+class RoleCache:
+    """LRU-кэш ролей с ограниченным временем жизни записей"""
+
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # user_id -> (role, истекает_в)
+
+    def get(self, user_id: int):
+        item = self._items.get(user_id)
+        if item is None or item[1] < time.monotonic():
+            self.misses += 1
+            return None
+        self._items.move_to_end(user_id)
+        self.hits += 1
+        return item[0]
+
+    def set(self, user_id: int, role: int):
+        self._items[user_id] = (role, time.monotonic() + self.ttl)
+        self._items.move_to_end(user_id)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
 
-def get_user_role(user_id: int) -> int:
+    def invalidate(self, user_id: int = None):
+        """Сбрасывает роль одного пользователя или весь кэш"""
+        if user_id is None:
+            self._items.clear()
+        else:
+            self._items.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+role_cache = RoleCache(ROLE_CACHE_TTL, ROLE_CACHE_SIZE)
+
+
+async def get_user_role(session: AsyncSession, user_id: int) -> int:
     if user_id == OWNER_ID:
         return 2
 
-    if user_id in ADMIN_IDS:
+    if user_id in await admin_registry.get(session):
         return 1
 
+    role = role_cache.get(user_id)
+    if role is not None:
+        return role
+
     # Для обычных пользователей проверяем роль в базе
-    session = Session()
-    user = session.query(User).filter_by(user_id=user_id).first()
-    return user.role if user else 0
\ No newline at end of file
+    role = await session.scalar(select(User.role).where(User.user_id == user_id))
+    role = role if role is not None else 0
+    role_cache.set(user_id, role)
+    return role
\ No newline at end of file
@@ -0,0 +1,13 @@
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from app.config import BOT_TOKEN, TELEGRAM_API_URL
+
+
+def create_bot() -> Bot:
+    """Бот с адресом API из TELEGRAM_API_URL, если он задан, иначе — обычный api.telegram.org"""
+    if not TELEGRAM_API_URL:
+        return Bot(token=BOT_TOKEN)
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    return Bot(token=BOT_TOKEN, session=session)
@@ -0,0 +1,132 @@
+from functools import lru_cache
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import DEFAULT_TIMEZONE
+from app.db.models import User, UserReminder
+from app.utils.reminder_log import log_reminder_changes
+
+# Фрагмент названия региона или города -> часовой пояс. Проверяем по порядку, первое совпадение
+# выигрывает, поэтому более длинные названия стоят раньше тех, в которые они входят
+# ('томск' раньше 'омск', 'сахалин' раньше 'саха')
+REGION_TIMEZONES = (
+    ("калининград", "Europe/Kaliningrad"),
+    ("самар", "Europe/Samara"),
+    ("удмурт", "Europe/Samara"),
+    ("ижевск", "Europe/Samara"),
+    ("ульяновск", "Europe/Ulyanovsk"),
+    ("астрахан", "Europe/Astrakhan"),
+    ("саратов", "Europe/Saratov"),
+    ("екатеринбург", "Asia/Yekaterinburg"),
+    ("свердлов", "Asia/Yekaterinburg"),
+    ("челябин", "Asia/Yekaterinburg"),
+    ("тюмен", "Asia/Yekaterinburg"),
+    ("курган", "Asia/Yekaterinburg"),
+    ("перм", "Asia/Yekaterinburg"),
+    ("башк", "Asia/Yekaterinburg"),  # Башкирия и Башкортостан
+    ("уфа", "Asia/Yekaterinburg"),
+    ("оренбург", "Asia/Yekaterinburg"),
+    ("ханты", "Asia/Yekaterinburg"),
+    ("югра", "Asia/Yekaterinburg"),
+    ("сургут", "Asia/Yekaterinburg"),
+    ("ямал", "Asia/Yekaterinburg"),
+    ("томск", "Asia/Tomsk"),
+    ("омск", "Asia/Omsk"),
+    ("новосибирск", "Asia/Novosibirsk"),
+    ("барнаул", "Asia/Barnaul"),
+    ("алтай", "Asia/Barnaul"),
+    ("кемеров", "Asia/Novokuznetsk"),
+    ("кузбасс", "Asia/Novokuznetsk"),
+    ("новокузнецк", "Asia/Novokuznetsk"),
+    ("красноярск", "Asia/Krasnoyarsk"),
+    ("хакас", "Asia/Krasnoyarsk"),
+    ("абакан", "Asia/Krasnoyarsk"),
+    ("тыва", "Asia/Krasnoyarsk"),
+    ("тува", "Asia/Krasnoyarsk"),
+    ("кызыл", "Asia/Krasnoyarsk"),
+    ("иркутск", "Asia/Irkutsk"),
+    ("бурят", "Asia/Irkutsk"),
+    ("улан-удэ", "Asia/Irkutsk"),
+    ("забайкал", "Asia/Chita"),
+    ("чита", "Asia/Chita"),
+    ("якут", "Asia/Yakutsk"),
+    ("сахалин", "Asia/Sakhalin"),
+    ("саха", "Asia/Yakutsk"),
+    ("амур", "Asia/Yakutsk"),
+    ("благовещенск", "Asia/Yakutsk"),
+    ("владивосток", "Asia/Vladivostok"),
+    ("примор", "Asia/Vladivostok"),
+    ("хабаровск", "Asia/Vladivostok"),
+    ("еврейск", "Asia/Vladivostok"),
+    ("биробиджан", "Asia/Vladivostok"),
+    ("магадан", "Asia/Magadan"),
+    ("камчат", "Asia/Kamchatka"),
+    ("чукот", "Asia/Anadyr"),
+    ("анадыр", "Asia/Anadyr"),
+)
+
+
+@lru_cache(maxsize=1024)
+def timezone_for_region(region) -> str:
+    """Часовой пояс по региону из анкеты; если регион не указан или не распознан — DEFAULT_TIMEZONE"""
+    if not region:
+        return DEFAULT_TIMEZONE
+    text = region.lower().replace("ё", "е")
+    for fragment, zone in REGION_TIMEZONES:
+        if fragment in text:
+            return zone
+    return DEFAULT_TIMEZONE
+
+
+def user_timezone(user) -> str:
+    """Часовой пояс пользователя (или строки с полями timezone и region)"""
+    return user.timezone or timezone_for_region(user.region)
+
+
+async def update_user_timezone(session: AsyncSession, user) -> bool:
+    """Пересчитывает пояс после изменения региона. Если он сменился, пишет в журнал напоминания
+    пользователя, чтобы диспетчер переложил только их. Коммит остаётся за вызывающим кодом"""
+    zone = timezone_for_region(user.region)
+    if zone == user.timezone:
+        return False
+    previous = user_timezone(user)
+    user.timezone = zone
+    if zone == previous:
+        # Пояс только записали (раньше он выводился при загрузке), расписание не меняется
+        return False
+    reminder_ids = (await session.scalars(
+        select(UserReminder.id).filter_by(user_id=user.user_id, is_active=True)
+    )).all()
+    log_reminder_changes(session, reminder_ids)
+    return True
+
+
+async def refresh_timezones(session: AsyncSession) -> int:
+    """Приводит сохранённые пояса к таблице REGION_TIMEZONES (нужно после её правки).
+
+    Один запрос по парам (регион, пояс); обновляются только расходящиеся пары, массово. В журнал
+    попадают напоминания только тех, у кого пояс действительно сменился. Возвращает их число;
+    коммит остаётся за вызывающим кодом"""
+    pairs = (await session.execute(
+        select(User.region, User.timezone).where(User.region != None).distinct()
+    )).all()
+    changed = 0
+    for region, stored in pairs:
+        zone = timezone_for_region(region)
+        if stored == zone:
+            continue
+        # Пустой пояс и так выводился из региона: записываем его, расписание не меняется
+        same_zone = User.timezone.is_(None) if stored is None else User.timezone == stored
+        users = select(User.user_id).where(User.region == region, same_zone)
+        if stored is not None:
+            reminder_ids = (await session.scalars(
+                select(UserReminder.id).where(UserReminder.user_id.in_(users), UserReminder.is_active == True)
+            )).all()
+            log_reminder_changes(session, reminder_ids)
+        result = await session.execute(
+            update(User).where(User.region == region, same_zone).values(timezone=zone)
+        )
+        if stored is not None:
+            changed += result.rowcount
+    return changed
@@ -0,0 +1,109 @@
+import asyncio
+import hmac
+import logging
+import secrets
+import signal
+
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+from app.config import (WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_QUEUE_SIZE,
+                        WEBHOOK_MAX_CONNECTIONS, WEBHOOK_DRAIN_TIMEOUT)
+from app.main import bot, dp, setup, cleanup
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookServer:
+    """Принимает апдейты от Telegram и обрабатывает каждый в своей задаче, как long polling.
+
+    Сколько хендлеров работает одновременно и в каком порядке идут апдейты одного чата,
+    решает ChatOrderingMiddleware: медленный чат не занимает обработку остальных. Здесь
+    ограничено только число принятых, но ещё не обработанных апдейтов: когда их queue_size,
+    ответ Telegram задерживается, и он сам сбавляет темп. При остановке новые апдейты больше
+    не принимаются, а уже принятые дорабатываются (не дольше drain_timeout секунд)."""
+
+    def __init__(self, secret: str, queue_size: int, drain_timeout: float):
+        self.secret = secret
+        self.drain_timeout = drain_timeout
+        self.slots = asyncio.Semaphore(queue_size)
+        self._tasks = set()
+        self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(token, self.secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": bot})
+        except (ValueError, ValidationError) as e:
+            # На 5xx Telegram повторяет запрос, а битое тело лучше не станет
+            logger.warning(f"Rejected malformed webhook update: {e}")
+            return web.Response(status=400)
+        await self.slots.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update):
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Failed to process update {update.update_id}: {e}")
+        finally:
+            self.slots.release()
+
+    async def start(self, host: str, port: int):
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Webhook server listening on {host}:{port}{WEBHOOK_PATH}")
+
+    async def stop(self):
+        # Сначала перестаём принимать соединения, потом дорабатываем принятое
+        if self._runner:
+            await self._runner.cleanup()
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+        if pending:
+            logger.warning(f"Webhook drain timed out, {len(pending)} updates left unprocessed")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def main():
+    """Бот в режиме вебхука: вместо одного long polling Telegram сам присылает апдейты"""
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL is not set")
+    # Без явного секрета генерируем свой на каждый запуск: set_webhook всё равно вызывается при старте
+    secret = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+
+    await setup()
+    server = WebhookServer(secret, WEBHOOK_QUEUE_SIZE, WEBHOOK_DRAIN_TIMEOUT)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await server.start(WEBHOOK_HOST, WEBHOOK_PORT)
+        await bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=secret,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        await stop.wait()
+    finally:
+        # Вебхук не снимаем: пока бот перезапускается, Telegram копит апдейты у себя
+        await server.stop()
+        await dp.fsm.close()
+        await cleanup()
+        logger.info("Бот остановлен")
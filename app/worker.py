@@ -0,0 +1,32 @@
+import asyncio
+import logging
+import signal
+
+from app.db import init_db
+from app.db.session import engine
+from app.services.reminder_service import bot, init_scheduler, shutdown_scheduler
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    """Отдельный процесс с диспетчером напоминаний: бот только пишет изменения в журнал"""
+    await init_db()
+    logger.info("Воркер напоминаний запускается...")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await init_scheduler()
+    try:
+        await stop.wait()
+    finally:
+        await shutdown_scheduler()
+        await bot.session.close()
+        # Закрываем соединения пула, иначе потоки aiosqlite не дадут процессу завершиться
+        await engine.dispose()
+        logger.info("Воркер напоминаний остановлен")
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""Сессия aiogram без сети: отвечает как Telegram и считает запросы"""
+import asyncio
+from collections import Counter
+from datetime import datetime
+
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage, CopyMessage, EditMessageText, GetMe
+from aiogram.types import Message, Chat, User, MessageId
+
+
+class FakeTelegramSession(BaseSession):
+    """Подменяет HTTP-сессию бота. latency — задержка ответа в секундах"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = Counter()
+        self._message_id = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        self._message_id += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="bench")
+        if isinstance(method, (SendMessage, EditMessageText)):
+            chat = Chat(id=method.chat_id or 1, type="private")
+            return Message(message_id=self._message_id, date=datetime.now(), chat=chat, text=method.text).as_(bot)
+        if isinstance(method, CopyMessage):
+            return MessageId(message_id=self._message_id)
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
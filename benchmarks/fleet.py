@@ -0,0 +1,66 @@
+"""Синтетический парк напоминаний для бенчмарков"""
+import json
+import random
+
+from sqlalchemy import insert
+
+from app.db.models import User, UserReminder
+
+# Доли типов расписания и напоминаний с тихим временем — примерно как в рабочей базе
+SCHEDULE_MIX = {"fixed": 0.5, "interval": 0.3, "random": 0.2}
+QUIET_SHARE = 0.3
+QUIET_WINDOWS = (("23:00", "07:00"), ("22:00", "08:00"), ("00:00", "09:00"), ("13:00", "14:00"))
+# Регион из анкеты -> часовой пояс через app.utils.timezones; веса — грубая доля учеников
+REGIONS = {"Москва": 0.45, None: 0.2, "Екатеринбург": 0.1, "Новосибирск": 0.08, "Самара": 0.05,
+           "Красноярск": 0.04, "Иркутск": 0.03, "Владивосток": 0.03, "Калининград": 0.01, "Камчатка": 0.01}
+HABIT_TYPES = ("water", "posture", "eyes", "stretch")
+CHUNK = 10000
+
+
+def _times(rng: random.Random) -> str:
+    # Время кратно 5 минутам: так люди обычно и выбирают
+    count = rng.choice((1, 1, 2, 3))
+    minutes = rng.sample(range(6 * 60, 23 * 60, 5), count)
+    return json.dumps([f"{minute // 60:02d}:{minute % 60:02d}" for minute in sorted(minutes)])
+
+
+def generate_chunk(rng: random.Random, first_user_id: int, size: int):
+    """Строки users и user_reminders для size пользователей (по одному напоминанию на каждого).
+
+    Случайные величины выбираются сразу на всю пачку, а не построчно — так генерация 1M строк
+    занимает секунды"""
+    user_ids = range(first_user_id, first_user_id + size)
+    regions = rng.choices(list(REGIONS), weights=list(REGIONS.values()), k=size)
+    schedules = rng.choices(list(SCHEDULE_MIX), weights=list(SCHEDULE_MIX.values()), k=size)
+    quiet = [rng.random() < QUIET_SHARE for _ in user_ids]
+    windows = rng.choices(QUIET_WINDOWS, k=size)
+    habits = rng.choices(HABIT_TYPES + (None,), k=size)
+
+    users = [{"user_id": user_id, "region": region, "role": 0} for user_id, region in zip(user_ids, regions)]
+    reminders = []
+    for index, user_id in enumerate(user_ids):
+        schedule_type = schedules[index]
+        start_time, end_time = windows[index] if quiet[index] else (None, None)
+        reminders.append({
+            "user_id": user_id,
+            "type": "habit" if habits[index] else "quote",
+            "habit_type": habits[index],
+            "schedule_type": schedule_type,
+            "times": _times(rng) if schedule_type == "fixed" else None,
+            "interval_hours": rng.choice((1, 2, 3, 4, 6)) if schedule_type == "interval" else None,
+            "random_interval_hours": rng.choice((2, 4, 8)) if schedule_type == "random" else None,
+            "start_time": start_time,
+            "end_time": end_time,
+            "is_active": True,
+        })
+    return users, reminders
+
+
+async def populate(session, size: int, seed: int = 0):
+    """Наполняет пустую БД парком из size пользователей с напоминаниями"""
+    rng = random.Random(seed)
+    for first in range(1, size + 1, CHUNK):
+        users, reminders = generate_chunk(rng, first, min(CHUNK, size + 1 - first))
+        await session.execute(insert(User), users)
+        await session.execute(insert(UserReminder), reminders)
+    await session.commit()
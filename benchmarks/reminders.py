@@ -0,0 +1,209 @@
+"""Бенчмарк планировщика напоминаний.
+
+    python -m benchmarks.reminders --sizes 1000 10000 100000 --hours 24
+
+Для каждого размера парка создаётся отдельная SQLite-база с синтетическими напоминаниями
+(benchmarks/fleet.py), затем замеряются загрузка индекса (schedule_reminder), память индекса,
+generate_random_time, send_reminder и сутки тиков в ускоренном времени против сессии без сети.
+Цифры стоит снимать до и после каждого изменения планировщика; --json сохраняет их для сравнения."""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+def configure(workdir: str):
+    """Настройки приложения читаются при импорте, поэтому задаём их до первого import app"""
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("BOT_TOKEN", "42:bench")
+    # Лимит частоты Telegram меряет не планировщик, а ожидание — в бенчмарке его снимаем
+    os.environ.setdefault("REMINDER_RATE", "1000000")
+    os.environ.setdefault("REMINDER_CONCURRENCY", "1000")
+    os.environ.setdefault("REMINDER_STATS_FLUSH_INTERVAL", "3600")
+
+
+class WriteCounter:
+    """Считает изменяющие запросы к БД и затронутые ими строки"""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.rows = 0
+        from sqlalchemy import event
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(WRITE_STATEMENTS):
+            self.statements += 1
+            self.rows += len(parameters) if executemany else 1
+
+    def reset(self):
+        self.statements = 0
+        self.rows = 0
+
+
+async def measure_index(rs) -> int:
+    """Сколько байт занимает индекс диспетчера: строим копию под tracemalloc"""
+    from app.db.models import UserReminder
+    from app.db.session import Session
+    from app.services.reminder_dispatcher import ReminderDispatcher
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    index = ReminderDispatcher()
+    async with Session() as session:
+        result = await session.stream(
+            rs.schedule_query().where(UserReminder.is_active == True).execution_options(yield_per=2000)
+        )
+        async for chunk in result.partitions():
+            for row in chunk:
+                rs.schedule_reminder(row, index, replace=False)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del index
+    return used
+
+
+async def bench(size: int, hours: int, seed: int, latency: float) -> dict:
+    from aiogram import Bot
+    from sqlalchemy import select
+
+    from app.db import init_db
+    from app.db.models import UserReminder
+    from app.db.session import Session, engine
+    from app.services import reminder_service as rs
+    from app.services.reminder_dispatcher import TimedSpec
+    from benchmarks.fake_telegram import FakeTelegramSession
+    from benchmarks.fleet import populate
+
+    result = {"size": size, "hours": hours}
+    writes = WriteCounter(engine)
+    telegram = FakeTelegramSession(latency)
+    rs.bot = Bot(os.environ["BOT_TOKEN"], session=telegram)
+
+    await init_db()
+    started = time.perf_counter()
+    async with Session() as session:
+        await populate(session, size, seed)
+    result["populate_s"] = time.perf_counter() - started
+
+    await rs.renew_leases()
+    loaded, result["load_s"] = await rs.load_reminders()
+    result["load_per_s"] = loaded / result["load_s"] if result["load_s"] else 0.0
+    result["index_bytes"] = await measure_index(rs)
+    result["index_bytes_per_reminder"] = result["index_bytes"] / loaded if loaded else 0.0
+
+    spec = TimedSpec(0, "random", None, 4, (23 * 60, 7 * 60), "Europe/Moscow")
+    calls = 20000
+    started = time.perf_counter()
+    for _ in range(calls):
+        rs.generate_random_time(spec)
+    result["random_time_us"] = (time.perf_counter() - started) / calls * 1e6
+
+    async with Session() as session:
+        sample = (await session.scalars(select(UserReminder.id).limit(100))).all()
+    started = time.perf_counter()
+    for reminder_id in sample:
+        await rs.send_reminder(reminder_id)
+    result["send_reminder_ms"] = (time.perf_counter() - started) / len(sample) * 1000 if sample else 0.0
+
+    # Сутки тиков в ускоренном времени: каждый тик ждёт свои отправки, как если бы успевал за минуту
+    writes.reset()
+    rs.tick_stats.clear()
+    telegram.calls.clear()
+    rs.last_tick = None
+    start = datetime.now().astimezone().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    started = time.perf_counter()
+    for minute in range(hours * 60):
+        await rs.tick(start + timedelta(minutes=minute))
+        if rs.sending_tasks:
+            await asyncio.gather(*rs.sending_tasks)
+    elapsed = time.perf_counter() - started
+    await rs.shutdown_scheduler()
+
+    fires = telegram.calls["SendMessage"]
+    result.update(
+        simulate_s=elapsed,
+        fires=fires,
+        fires_per_s=fires / elapsed if elapsed else 0.0,
+        quiet_skips=rs.tick_stats["quiet"],
+        late=rs.tick_stats["late"],
+        missed=rs.tick_stats["missed"],
+        db_write_statements=writes.statements,
+        db_write_rows=writes.rows,
+        db_writes_per_fire=writes.statements / fires if fires else 0.0,
+    )
+    await rs.bot.session.close()
+    await engine.dispose()
+    return result
+
+
+def report(result: dict):
+    print(
+        f"\n== {result['size']} reminders, {result['hours']} h ==\n"
+        f"populate            {result['populate_s']:.2f} s\n"
+        f"load index          {result['load_s']:.2f} s ({result['load_per_s']:.0f}/s)\n"
+        f"index memory        {result['index_bytes'] / 2 ** 20:.1f} MiB "
+        f"({result['index_bytes_per_reminder']:.0f} B/reminder)\n"
+        f"generate_random_time {result['random_time_us']:.1f} us\n"
+        f"send_reminder       {result['send_reminder_ms']:.2f} ms\n"
+        f"simulation          {result['simulate_s']:.2f} s, {result['fires']} fires, "
+        f"{result['fires_per_s']:.0f} fires/s\n"
+        f"quiet skips         {result['quiet_skips']}\n"
+        f"misfires            {result['late']} late, {result['missed']} missed\n"
+        f"db writes           {result['db_write_statements']} statements, {result['db_write_rows']} rows, "
+        f"{result['db_writes_per_fire']:.4f} statements/fire"
+    )
+
+
+def run_child(args, size: int) -> dict:
+    """Каждый размер — в отдельном процессе: движок БД создаётся при импорте приложения"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as out:
+        path = out.name
+    command = [sys.executable, "-m", "benchmarks.reminders", "--size", str(size), "--hours", str(args.hours),
+               "--seed", str(args.seed), "--latency", str(args.latency), "--json", path, "--quiet"]
+    subprocess.run(command, check=True)
+    with open(path) as file:
+        result = json.load(file)
+    os.remove(path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк планировщика напоминаний")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="размеры парка (от 1000 до 1000000)")
+    parser.add_argument("--size", type=int, help="один размер в текущем процессе")
+    parser.add_argument("--hours", type=int, default=24, help="сколько часов симулировать")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа Telegram, с")
+    parser.add_argument("--json", help="куда сохранить результаты")
+    parser.add_argument("--quiet", action="store_true", help="не печатать отчёт")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.size is None:
+        results = [run_child(args, size) for size in args.sizes]
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            configure(workdir)
+            results = [asyncio.run(bench(args.size, args.hours, args.seed, args.latency))]
+
+    if not args.quiet:
+        for result in results:
+            report(result)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results if args.size is None else results[0], file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+from app.webhook import main
+import asyncio
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""Локальная заглушка Telegram Bot API для нагрузочных тестов бота без сети.
+
+    python -m tools.fake_telegram_api --port 8081 --rate 30 --latency 0.05 --blocked-share 0.02 \\
+        --script tools/sample_traffic.jsonl --users 500
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=42:fake python run.py
+
+Умеет: задержку ответа, 429 с retry_after при превышении общего лимита, 403 от пользователей,
+заблокировавших бота, и выдачу через getUpdates заранее записанного трафика пользователей.
+Скрипт трафика — JSON Lines: {"at": 0.5, "text": "/start"} или {"at": 3, "callback_data": "chat_all"};
+at — секунды от начала сценария, user_id в строке необязателен. С --users N сценарий проигрывают
+N пользователей, каждый со сдвигом --stagger секунд. Счётчики — GET /stats и в логе при остановке."""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+logger = logging.getLogger("fake_telegram_api")
+
+BOT_USER = {"id": 42, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+FIRST_USER_ID = 1_000_000
+
+
+class FakeTelegram:
+    def __init__(self, rate: float, latency: float, jitter: float, blocked_share: float, seed: int = 0):
+        self.rate = rate
+        self.latency = latency
+        self.jitter = jitter
+        self.blocked_share = blocked_share
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.message_id = 0
+        self.updates = []  # очередь апдейтов для getUpdates
+        self.next_update_id = 1
+        self.new_updates = asyncio.Event()
+
+    # --- поведение Telegram ---
+
+    def take_token(self) -> float:
+        """Общий лимит отправок; 0 — можно, иначе через сколько секунд повторить"""
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return max(1, round((1 - self.tokens) / self.rate))
+
+    def is_blocked(self, chat_id: int) -> bool:
+        # Детерминированно по chat_id, чтобы один и тот же пользователь всегда был недоступен
+        return (chat_id * 2654435761) % 10000 < self.blocked_share * 10000
+
+    def message(self, chat_id: int, text: str = None) -> dict:
+        self.message_id += 1
+        return {"message_id": self.message_id, "date": int(time.time()), "from": BOT_USER,
+                "chat": {"id": chat_id, "type": "private"}, "text": text or ""}
+
+    # --- трафик пользователей ---
+
+    def push_update(self, user_id: int, item: dict):
+        user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        chat = {"id": user_id, "type": "private"}
+        update = {"update_id": self.next_update_id}
+        if "callback_data" in item:
+            update["callback_query"] = {
+                "id": str(self.next_update_id), "from": user, "chat_instance": str(user_id),
+                "data": item["callback_data"], "message": self.message(user_id, "меню"),
+            }
+        else:
+            self.message_id += 1
+            update["message"] = {"message_id": self.message_id, "date": int(time.time()), "from": user,
+                                 "chat": chat, "text": item.get("text", "")}
+        self.next_update_id += 1
+        self.updates.append(update)
+        self.stats["updates_queued"] += 1
+        self.new_updates.set()
+
+    async def replay(self, script: list, users: int, stagger: float):
+        """Выдаёт апдейты сценария в нужные моменты времени"""
+        events = []
+        for index in range(users):
+            for item in script:
+                user_id = item.get("user_id", FIRST_USER_ID + index) if users == 1 else FIRST_USER_ID + index
+                events.append((item.get("at", 0) + index * stagger, user_id, item))
+        events.sort(key=lambda event: event[0])
+        started = time.monotonic()
+        for at, user_id, item in events:
+            delay = started + at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.push_update(user_id, item)
+        logger.info(f"Script finished: {len(events)} updates")
+
+    async def get_updates(self, offset: int, limit: int, timeout: float) -> list:
+        # Подтверждённые (update_id < offset) выбрасываем, как настоящий Telegram
+        self.updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not self.updates and timeout:
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:limit]
+
+    # --- HTTP ---
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        if not params and request.can_read_body and request.content_type == "application/json":
+            params = await request.json()
+        self.stats[method] += 1
+
+        if method == "getUpdates":
+            updates = await self.get_updates(int(params.get("offset") or 0), int(params.get("limit") or 100),
+                                             float(params.get("timeout") or 0))
+            return ok(updates)
+
+        if self.latency:
+            await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+
+        if method in ("getMe", "logOut", "close"):
+            return ok(BOT_USER if method == "getMe" else True)
+
+        chat_id = params.get("chat_id")
+        if chat_id is not None and method in SENDING_METHODS:
+            retry_after = self.take_token()
+            if retry_after:
+                self.stats["429"] += 1
+                return error(429, f"Too Many Requests: retry after {retry_after}", {"retry_after": retry_after})
+            if self.is_blocked(int(chat_id)):
+                self.stats["403"] += 1
+                return error(403, "Forbidden: bot was blocked by the user")
+
+        if method in ("sendMessage", "editMessageText", "sendPhoto", "sendDocument"):
+            if method != "editMessageText":
+                self.stats["delivered"] += 1
+            return ok(self.message(int(chat_id), params.get("text") or params.get("caption")))
+        if method == "copyMessage":
+            self.stats["delivered"] += 1
+            self.message_id += 1
+            return ok({"message_id": self.message_id})
+        # deleteMessage, answerCallbackQuery, setMyCommands и прочее
+        return ok(True)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+
+SENDING_METHODS = {"sendMessage", "copyMessage", "editMessageText", "sendPhoto", "sendDocument"}
+
+
+def ok(result) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def error(code: int, description: str, parameters: dict = None) -> web.Response:
+    body = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return web.json_response(body, status=code)
+
+
+def load_script(path: str) -> list:
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def create_app(fake: FakeTelegram, script: list = None, users: int = 1, stagger: float = 0.0) -> web.Application:
+    app = web.Application()
+    app.router.add_route("*", "/bot{token}/{method}", fake.handle)
+    app.router.add_get("/stats", fake.handle_stats)
+
+    async def start_replay(app):
+        if script:
+            app["replay"] = asyncio.create_task(fake.replay(script, users, stagger))
+
+    async def stop_replay(app):
+        task = app.get("replay")
+        if task:
+            task.cancel()
+        logger.info(f"Stats: {dict(fake.stats)}")
+
+    app.on_startup.append(start_replay)
+    app.on_cleanup.append(stop_replay)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--rate", type=float, default=30, help="отправок в секунду до 429 (0 — без лимита)")
+    parser.add_argument("--latency", type=float, default=0.0, help="средняя задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки, с")
+    parser.add_argument("--blocked-share", type=float, default=0.0, help="доля пользователей, заблокировавших бота")
+    parser.add_argument("--script", help="сценарий трафика пользователей (JSON Lines)")
+    parser.add_argument("--users", type=int, default=1, help="сколько пользователей проигрывают сценарий")
+    parser.add_argument("--stagger", type=float, default=0.1, help="сдвиг между пользователями, с")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    fake = FakeTelegram(args.rate, args.latency, args.jitter, args.blocked_share, args.seed)
+    script = load_script(args.script) if args.script else None
+    web.run_app(create_app(fake, script, args.users, args.stagger), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Минимальный сервер с протоколом Redis (RESP) для локального запуска FSM_STORAGE=redis.
+
+    python -m tools.resp_server --port 6379 --dump fsm.json
+    FSM_STORAGE=redis REDIS_URL=redis://127.0.0.1:6379/0 python run.py
+
+Поддерживает строковые ключи с TTL — то, что нужно RedisStorage из aiogram: GET, SET (EX/PX/NX/XX),
+DEL, EXISTS, EXPIRE, PEXPIRE, TTL, PTTL, KEYS, DBSIZE, FLUSHDB, а также служебные PING, ECHO, SELECT,
+AUTH, CLIENT, INFO, QUIT. Данные живут в памяти; с --dump сохраняются в JSON при остановке и раз в
+--dump-interval секунд и читаются при старте. Одна база на все SELECT. Не для продакшена."""
+import argparse
+import asyncio
+import base64
+import fnmatch
+import json
+import logging
+import os
+import signal
+import time
+
+logger = logging.getLogger("resp_server")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Store:
+    """Ключ -> (значение, момент истечения по time.time() или None)"""
+
+    def __init__(self):
+        self.items = {}
+
+    def get(self, key: bytes):
+        item = self.items.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            del self.items[key]
+            return None
+        return item
+
+    def sweep(self):
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self.items.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self.items[key]
+        return len(expired)
+
+    def dump(self, path: str):
+        self.sweep()
+        encode = lambda raw: base64.b64encode(raw).decode()
+        payload = [[encode(key), encode(value), expires_at] for key, (value, expires_at) in self.items.items()]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as file:
+            json.dump(payload, file)
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        with open(path) as file:
+            for key, value, expires_at in json.load(file):
+                self.items[base64.b64decode(key)] = (base64.b64decode(value), expires_at)
+        self.sweep()
+
+
+async def read_command(reader: asyncio.StreamReader):
+    """Читает команду: массив bulk-строк или inline-строку; None — клиент отключился"""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.strip().split()
+    args = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        if not header.startswith(b"$"):
+            raise ProtocolError("expected bulk string")
+        size = int(header[1:])
+        data = await reader.readexactly(size + 2)
+        args.append(data[:-2])
+    return args
+
+
+def simple(text: str) -> bytes:
+    return f"+{text}\r\n".encode()
+
+
+def error(text: str) -> bytes:
+    return f"-ERR {text}\r\n".encode()
+
+
+def integer(number: int) -> bytes:
+    return f":{number}\r\n".encode()
+
+
+def bulk(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+
+
+def array(values) -> bytes:
+    return b"*" + str(len(values)).encode() + b"\r\n" + b"".join(bulk(value) for value in values)
+
+
+class RespServer:
+    def __init__(self, store: Store):
+        self.store = store
+        self.commands = 0
+
+    def execute(self, args) -> bytes:
+        name = args[0].decode().upper()
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return error(f"unknown command '{name}'")
+        try:
+            return handler(*args[1:])
+        except (TypeError, ValueError):
+            return error(f"wrong arguments for '{name}' command")
+
+    # --- служебные ---
+
+    def cmd_ping(self, message=None):
+        return bulk(message) if message is not None else simple("PONG")
+
+    def cmd_echo(self, message):
+        return bulk(message)
+
+    def cmd_select(self, index):
+        return simple("OK")
+
+    def cmd_auth(self, *args):
+        return simple("OK")
+
+    def cmd_client(self, *args):
+        return simple("OK")
+
+    def cmd_info(self, *args):
+        return bulk(f"# Server\r\nredis_version:7.0.0\r\nkeys:{len(self.store.items)}\r\n".encode())
+
+    # --- ключи ---
+
+    def cmd_get(self, key):
+        item = self.store.get(key)
+        return bulk(item[0] if item else None)
+
+    def cmd_set(self, key, value, *options):
+        expires_at = None
+        keep_ttl = only_new = only_existing = False
+        options = [option.upper() for option in options]
+        index = 0
+        while index < len(options):
+            option = options[index]
+            if option in (b"EX", b"PX"):
+                amount = float(options[index + 1])
+                expires_at = time.time() + (amount if option == b"EX" else amount / 1000)
+                index += 1
+            elif option == b"NX":
+                only_new = True
+            elif option == b"XX":
+                only_existing = True
+            elif option == b"KEEPTTL":
+                keep_ttl = True
+            else:
+                return error("syntax error")
+            index += 1
+
+        current = self.store.get(key)
+        if (only_new and current) or (only_existing and not current):
+            return bulk(None)
+        if keep_ttl and current:
+            expires_at = current[1]
+        self.store.items[key] = (value, expires_at)
+        return simple("OK")
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self.store.get(key):
+                del self.store.items[key]
+                deleted += 1
+        return integer(deleted)
+
+    def cmd_exists(self, *keys):
+        return integer(sum(1 for key in keys if self.store.get(key)))
+
+    def _expire(self, key, seconds: float) -> bytes:
+        item = self.store.get(key)
+        if not item:
+            return integer(0)
+        self.store.items[key] = (item[0], time.time() + seconds)
+        return integer(1)
+
+    def cmd_expire(self, key, seconds):
+        return self._expire(key, float(seconds))
+
+    def cmd_pexpire(self, key, milliseconds):
+        return self._expire(key, float(milliseconds) / 1000)
+
+    def _ttl(self, key, scale: int) -> bytes:
+        item = self.store.get(key)
+        if not item:
+            return integer(-2)
+        if item[1] is None:
+            return integer(-1)
+        return integer(int((item[1] - time.time()) * scale))
+
+    def cmd_ttl(self, key):
+        return self._ttl(key, 1)
+
+    def cmd_pttl(self, key):
+        return self._ttl(key, 1000)
+
+    def cmd_keys(self, pattern):
+        self.store.sweep()
+        pattern = pattern.decode()
+        return array([key for key in self.store.items if fnmatch.fnmatchcase(key.decode(errors="replace"), pattern)])
+
+    def cmd_dbsize(self):
+        self.store.sweep()
+        return integer(len(self.store.items))
+
+    def cmd_flushdb(self, *args):
+        self.store.items.clear()
+        return simple("OK")
+
+    cmd_flushall = cmd_flushdb
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    args = await read_command(reader)
+                except (ProtocolError, ValueError) as e:
+                    writer.write(error(f"Protocol error: {e}"))
+                    break
+                if args is None:
+                    break
+                if not args:
+                    continue
+                self.commands += 1
+                if args[0].upper() == b"QUIT":
+                    writer.write(simple("OK"))
+                    break
+                writer.write(self.execute(args))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int, dump: str, dump_interval: float):
+    store = Store()
+    if dump and os.path.exists(dump):
+        store.load(dump)
+        logger.info(f"Loaded {len(store.items)} keys from {dump}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = RespServer(store)
+    listener = await asyncio.start_server(server.handle_client, host, port)
+    logger.info(f"Listening on {host}:{port}")
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), dump_interval)
+            except asyncio.TimeoutError:
+                pass
+            expired = store.sweep()
+            if dump:
+                store.dump(dump)
+            logger.debug(f"{len(store.items)} keys, {expired} expired, {server.commands} commands")
+    finally:
+        listener.close()
+        if dump:
+            store.dump(dump)
+            logger.info(f"Saved {len(store.items)} keys to {dump}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Минимальный сервер с протоколом Redis")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--dump", help="JSON-файл для сохранения ключей между запусками")
+    parser.add_argument("--dump-interval", type=float, default=60)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.host, args.port, args.dump, args.dump_interval))
+
+
+if __name__ == "__main__":
+    main()